@@ -1,45 +1,40 @@
 #!/usr/bin/env python
 
 import rrt
+import sys, time
+from functools import partial
 import numpy as np
 from problem import BitmapProblem
+from neighbors import KDTreeIndex, GridIndex
+from runner import run_trials, print_stats
 
 from PIL import Image
 
 
-if __name__ == '__main__':
-	# Problem
+def make_problem():
 	# problem = BitmapProblem(Image.open("./benchmarks/slit_500x500_offset_init80x250_goal420x250.png"), (80, 250), (420,250), 20)
 	# problem = BitmapProblem(Image.open("./benchmarks/slit_500x500_centre_init80x250_goal420x250.png"), (80, 250), (420,250), 20)
 	# problem = BitmapProblem(Image.open("./benchmarks/twoslits_500x500_init80x250_goal420x250.png"), (80, 250), (420,250), 10)
 	problem = BitmapProblem(Image.open("./benchmarks/maze_500x500_init147x29_goal470x430.png"), (147, 29), (470,430), 10)
 	# problem = BitmapProblem(Image.open("./benchmarks/block_500x500_init80x250_goal420x250.png"), (80, 250), (420,250), 20)
 	# problem = BitmapProblem(Image.open("./benchmarks/worms_500x500_init60x440_goal440x60.png"), (60, 440), (440,60), 20)
-	
+	return problem
+
+
+if __name__ == '__main__':
+	# Nearest-neighbor index, selected by the first command line argument
+	indices = {'linear': None, 'kdtree': KDTreeIndex, 'grid': GridIndex}
+	index = indices[sys.argv[1] if len(sys.argv) > 1 else 'linear']
+	# Number of random states extended toward per step, selected by the second command line argument
+	batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+	# Number of worker processes, selected by the third command line argument (defaults to the number of CPUs)
+	processes = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
 	# Solve
-	#solver = rrt.RRT(problem)
-	solver = rrt.BIRRT(problem)
-
-	counts = []
-	extensions = []
-	t1count = []
-	t2count = []
-	for i in xrange(0, 100):
-		#final_state,tree1 = solver.build_rrt(problem.x_init, problem.x_goal, 50000, goal_bias=0.05, show_vis=True); tree2 = None # For normal RRT
-		final_state,tree1,tree2 = solver.build_rrt(problem.x_init, problem.x_goal, 50000, show_vis=False) # For BIRRT
-		
-		counts.append(solver._iterations_executed)
-		t1count.append(len(tree1.nodes))
-		if tree2:
-			t2count.append(len(tree2.nodes))
-
-	print "counts", counts
-	print "t1count", t1count
-	if t2count:
-		print "t2count", t2count
-
-
-	print "iterations:\t", np.mean(counts), np.std(counts)
-	print "t1 extensions\t", np.mean(t1count), np.std(t1count)
-	if t2count:
-		print "t2 extensions\t", np.mean(t2count), np.std(t2count)
\ No newline at end of file
+	#make_solver = partial(rrt.RRT, index=index)
+	make_solver = partial(rrt.BIRRT, index=index)
+
+	start = time.time()
+	#results = run_trials(make_problem, make_solver, 100, 50000, processes, goal_bias=0.05) # For normal RRT
+	results = run_trials(make_problem, make_solver, 100, 50000, processes, batch_size=batch_size) # For BIRRT
+	print_stats(results, time.time() - start)
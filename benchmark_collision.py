@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+
+import glob, random, timeit
+import numpy as np
+from problem import Basic2DProblem, BitmapProblem
+
+from PIL import Image
+
+
+if __name__ == '__main__':
+	n = 100000
+
+	print "map\t\t\t\t\t\tgetpixel\tvalid_state\tvalid_states (us/query)"
+	for path in sorted(glob.glob("./benchmarks/*.png")):
+		image = Image.open(path)
+		bitmap = image.convert('1')
+		y, x = np.argwhere(np.array(bitmap, dtype=bool))[0] # any free pixel will do as init and goal
+		problem = BitmapProblem(image, (x, y), (x, y), 20)
+
+		random.seed(0)
+		states = [problem.random_state() for i in xrange(n)]
+		batch = np.array(states)
+
+		# valid_state as implemented before the occupancy array: bounds, then PIL getpixel
+		def getpixel():
+			for x in states:
+				Basic2DProblem.valid_state(problem, x) and bitmap.getpixel(x) != 0
+		def valid_state():
+			for x in states:
+				problem.valid_state(x)
+		def valid_states():
+			problem.valid_states(batch)
+
+		times = [min(timeit.repeat(f, number=1, repeat=3))/n*1e6 for f in (getpixel, valid_state, valid_states)]
+		print "%-48s%.3f\t\t%.3f\t\t%.4f" % ((path.split('/')[-1],) + tuple(times))
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+''' Benchmark suite: runs RRT, BIRRT and BIRRT in RRT-Connect mode on every map in ./benchmarks, and both BIRRT modes on the moving rectangle problem, at fixed seeds, and writes the results to a JSON file.
+
+	Usage:
+	  benchmark_suite.py run [-o results.json] [--trials N] [--seed S] [--processes P] [--index grid] [--only substring] [--free-sampling] [--profile]
+	  benchmark_suite.py compare old.json new.json [--alpha 0.01] [--threshold 0.05]
+
+	compare flags cases whose wall time per trial got significantly slower (one-sided Mann-Whitney U test) by more than the threshold, and exits with status 1 if there are any.
+'''
+
+import rrt
+import argparse, json, math, platform, sys, time
+import multiprocessing
+from functools import partial
+import numpy as np
+from problem import BitmapProblem
+from rectangle_problem import MovingRectangleProblem
+from neighbors import KDTreeIndex, GridIndex, SE2Index
+from runner import run_trials, phase_times
+
+from PIL import Image
+
+
+# map file (in ./benchmarks), init, goal, max_step
+MAPS = [("slit_500x500_centre_init80x250_goal420x250.png", (80, 250), (420,250), 20),
+		("slit_500x500_offset_init80x250_goal420x250.png", (80, 250), (420,250), 20),
+		("twoslits_500x500_init80x250_goal420x250.png", (80, 250), (420,250), 10),
+		("block_500x500_init80x250_goal420x250.png", (80, 250), (420,250), 20),
+		("maze_500x500_init147x29_goal470x430.png", (147, 29), (470,430), 10),
+		("worms_500x500_init60x440_goal440x60.png", (60, 440), (440,60), 20)]
+
+INDICES = {'linear': None, 'kdtree': KDTreeIndex, 'grid': GridIndex}
+
+
+def bitmap_problem(path, init, goal, max_step, free_sampling=False):
+	return BitmapProblem(Image.open("./benchmarks/" + path), init, goal, max_step, free_sampling=free_sampling)
+
+def rectangle_problem(free_sampling=False):
+	return MovingRectangleProblem(Image.open("./benchmarks/worms_500x500_init60x440_goal440x60.png"), 20, 40, (60, 440, 0), (440,60, 0), 20, max_rot=math.pi/18, free_sampling=free_sampling)
+
+def cases(index, profile=False, free_sampling=False):
+	''' Yields (name, make_problem, make_solver, build_rrt keyword arguments) for every case of the suite. '''
+	for path, init, goal, max_step in MAPS:
+		make_problem = partial(bitmap_problem, path, init, goal, max_step, free_sampling)
+		name = path.split('_init')[0]
+		yield name + "/rrt", make_problem, partial(rrt.RRT, index=index, profile=profile), {'goal_bias': 0.05}
+		yield name + "/birrt", make_problem, partial(rrt.BIRRT, index=index, profile=profile), {}
+		yield name + "/birrt-connect", make_problem, partial(rrt.BIRRT, index=index, profile=profile), {'connect': 'both'}
+	yield "rectangle_worms/birrt", partial(rectangle_problem, free_sampling), partial(rrt.BIRRT, index=SE2Index, profile=profile), {}
+	yield "rectangle_worms/birrt-connect", partial(rectangle_problem, free_sampling), partial(rrt.BIRRT, index=SE2Index, profile=profile), {'connect': 'both'}
+
+
+def summarize(results):
+	''' Returns the statistics of one case, as stored in the JSON file. '''
+	times = np.array([r[3] for r in results])
+	iterations = [r[1] for r in results]
+	nodes = [sum(r[2]) for r in results]
+	return {'trials': len(results),
+			'success_rate': np.mean([r[0] for r in results]),
+			'iterations': {'mean': np.mean(iterations), 'std': np.std(iterations)},
+			'nodes': {'mean': np.mean(nodes), 'std': np.std(nodes)},
+			'time': {'mean': times.mean(), 'std': times.std(),
+					 'p50': np.percentile(times, 50), 'p90': np.percentile(times, 90), 'p99': np.percentile(times, 99)},
+			'times': times.tolist(),
+			'phases': dict(phase_times(results))}
+
+
+def run(args):
+	output = {'seed': args.seed, 'max_iter': args.max_iter, 'index': args.index, 'free_sampling': args.free_sampling,
+			  'machine': {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(), 'cpus': multiprocessing.cpu_count()},
+			  'cases': {}}
+	for name, make_problem, make_solver, kwargs in cases(INDICES[args.index], args.profile, args.free_sampling):
+		if args.only and args.only not in name:
+			continue
+		start = time.time()
+		results = run_trials(make_problem, make_solver, args.trials, args.max_iter, args.processes, args.seed, **kwargs)
+		stats = summarize(results)
+		output['cases'][name] = stats
+		print "%-33s solved %5.1f%%  iterations %8.0f  nodes %7.0f  time p50 %.3f s  p90 %.3f s  (wall %.1f s)" % (
+			name, 100*stats['success_rate'], stats['iterations']['mean'], stats['nodes']['mean'], stats['time']['p50'], stats['time']['p90'], time.time() - start)
+		if stats['phases']:
+			total = sum(stats['phases'].values()) or 1.
+			print "%33s %s" % ("", "  ".join("%s %.0f%%" % (phase, 100*t/total) for phase, t in phase_times(results)))
+
+	with open(args.output, 'w') as f:
+		json.dump(output, f, indent=1, sort_keys=True)
+	print "results written to", args.output
+
+
+def slower_p_value(old, new):
+	''' One-sided Mann-Whitney U test, with the normal approximation: returns the p-value of the hypothesis that times in new tend to be larger than times in old. '''
+	old = np.asarray(old); new = np.asarray(new)
+	n, m = len(new), len(old)
+	u = (new[:,None] > old[None,:]).sum() + 0.5*(new[:,None] == old[None,:]).sum()
+	mean = n*m/2.
+	std = math.sqrt(n*m*(n+m+1)/12.)
+	z = (u - 0.5 - mean)/std # with continuity correction
+	return 0.5*math.erfc(z/math.sqrt(2))
+
+
+def compare(args):
+	with open(args.old) as f:
+		old = json.load(f)['cases']
+	with open(args.new) as f:
+		new = json.load(f)['cases']
+
+	regressions = []
+	print "%-33s%10s%10s%9s%10s" % ("case", "old p50", "new p50", "change", "p-value")
+	for name in sorted(set(old) & set(new)):
+		a = old[name]; b = new[name]
+		change = b['time']['p50']/a['time']['p50'] - 1
+		p = slower_p_value(a['times'], b['times'])
+		flag = ""
+		if p < args.alpha and change > args.threshold:
+			flag = "  SLOWER"
+			regressions.append(name)
+		if b['success_rate'] < a['success_rate']:
+			flag += "  success rate %.1f%% -> %.1f%%" % (100*a['success_rate'], 100*b['success_rate'])
+		print "%-33s%9.3fs%9.3fs%+8.1f%%%10.4f%s" % (name, a['time']['p50'], b['time']['p50'], 100*change, p, flag)
+	for name in sorted(set(old) ^ set(new)):
+		print "%-33s only in %s" % (name, args.old if name in old else args.new)
+
+	if regressions:
+		print "%d significant slowdown(s): %s" % (len(regressions), ", ".join(regressions))
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="RRT benchmark suite over the maps in ./benchmarks")
+	commands = parser.add_subparsers(dest='command')
+
+	p = commands.add_parser('run', help="run the suite and write the results to a JSON file")
+	p.add_argument('-o', '--output', default='benchmark_results.json')
+	p.add_argument('--trials', type=int, default=100, help="trials per case")
+	p.add_argument('--max-iter', type=int, default=50000)
+	p.add_argument('--seed', type=int, default=0)
+	p.add_argument('--processes', type=int, default=None, help="worker processes (default: number of CPUs)")
+	p.add_argument('--index', choices=sorted(INDICES), default='grid', help="nearest-neighbor index for the bitmap problems")
+	p.add_argument('--only', default=None, help="run only cases whose name contains this string")
+	p.add_argument('--free-sampling', action='store_true', help="sample free space only (see BitmapProblem)")
+	p.add_argument('--profile', action='store_true', help="record the time spent in each planner phase (slows down the planners)")
+
+	p = commands.add_parser('compare', help="compare two result files and flag slowdowns")
+	p.add_argument('old')
+	p.add_argument('new')
+	p.add_argument('--alpha', type=float, default=0.01, help="significance level")
+	p.add_argument('--threshold', type=float, default=0.05, help="minimum relative slowdown of the median time to report")
+
+	args = parser.parse_args()
+	{'run': run, 'compare': compare}[args.command](args)
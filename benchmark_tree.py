@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+import rrt
+import gc, math, random, sys, time
+import numpy as np
+from problem import BitmapProblem
+from rectangle_problem import MovingRectangleProblem
+
+from PIL import Image
+
+
+def deep_size(obj):
+	''' Returns the number of bytes used by obj and every object reachable from it, counting NumPy array buffers. '''
+	seen = set()
+	pending = [obj]
+	size = 0
+	while pending:
+		o = pending.pop()
+		if id(o) in seen or isinstance(o, type):
+			continue
+		seen.add(id(o))
+		size += sys.getsizeof(o) # includes the buffer of arrays that own their data
+		if isinstance(o, np.ndarray) and o.base is not None:
+			pending.append(o.base)
+		pending.extend(gc.get_referents(o))
+	return size
+
+def build(tree_class, problem, n):
+	''' Builds a tree of n random states, each attached to a random earlier node. Returns the tree and the build time. '''
+	random.seed(0)
+	states = [problem.random_state() for i in xrange(n)]
+	start = time.time()
+	tree = tree_class(problem.x_init)
+	for x in states:
+		parent = tree.nodes[random.randrange(len(tree.nodes))]
+		tree.add_node(x, parent, x)
+	return tree, time.time() - start
+
+
+if __name__ == '__main__':
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+	image = Image.open("./benchmarks/worms_500x500_init60x440_goal440x60.png")
+	problems = [('2-D', BitmapProblem(image, (60, 440), (440,60), 20)),
+				('3-D', MovingRectangleProblem(image, 20, 40, (60, 440, 0), (440,60, 0), 20, max_rot=math.pi/18))]
+
+	for name, problem in problems:
+		for tree_class in (rrt.Tree, rrt.ArrayTree):
+			tree, elapsed = build(tree_class, problem, n)
+			size = deep_size(tree)
+			print "%s %-9s\t%d nodes\tbuild: %.3f s\tmemory: %.1f MB (%d bytes/node)" % (name, tree_class.__name__, len(tree.nodes), elapsed, size/1e6, size/len(tree.nodes))
@@ -0,0 +1,401 @@
+''' Module neighbors provides nearest-neighbor indices for RRT trees. An index is constructed with a Problem instance, and is passed as a class to an RRT solver, which creates one index per tree.
+
+    Indices store states in insertion order and identify them by position, so that position i corresponds to tree.nodes[i]. Ties are resolved in favour of the earliest state, so every index returns the same node as a linear scan over tree.nodes.
+'''
+
+import math
+import numpy as np
+
+
+class NeighborIndex(object):
+    ''' Interface for nearest-neighbor indices. '''
+
+    def __init__(self, problem):
+        raise NotImplementedError("Should have implemented this")
+
+    def add(self, x):
+        ''' Adds state x to the index. The position of x is the number of states added before it. '''
+        raise NotImplementedError("Should have implemented this")
+
+    def nearest(self, x):
+        ''' Returns the position of the indexed state with minimum distance to x. '''
+        raise NotImplementedError("Should have implemented this")
+
+    def nearest_many(self, xs):
+        ''' Returns the positions of the nearest indexed states to each state in xs. '''
+        return [self.nearest(x) for x in xs]
+
+    def near(self, x, radius):
+        ''' Returns the sorted positions of the indexed states within distance radius of x, i.e. whose (squared) distance to x is at most radius**2. '''
+        raise NotImplementedError("Should have implemented this")
+
+    def __len__(self):
+        raise NotImplementedError("Should have implemented this")
+
+
+class BruteForceIndex(NeighborIndex):
+    ''' Linear scan using the problem's metric. Works for any problem. '''
+
+    def __init__(self, problem):
+        self.metric = problem.metric
+        self.states = []
+
+    def add(self, x):
+        self.states.append(x)
+
+    def nearest(self, x):
+        min_dist = float('inf')
+        nearest = None
+        for i, state in enumerate(self.states):
+            dist = self.metric(state, x)
+            if dist < min_dist:
+                min_dist = dist
+                nearest = i
+        return nearest
+
+    def near(self, x, radius):
+        r2 = radius*radius
+        return [i for i, state in enumerate(self.states) if self.metric(state, x) <= r2]
+
+    def __len__(self):
+        return len(self.states)
+
+
+class PointArray(object):
+    ''' Growable (n, dim) float array, doubling its capacity as points are appended. '''
+
+    def __init__(self, dim, capacity=256):
+        self.data = np.empty((capacity, dim))
+        self.n = 0
+
+    def append(self, x):
+        if self.n == len(self.data):
+            data = np.empty((2*len(self.data), self.data.shape[1]))
+            data[:self.n] = self.data
+            self.data = data
+        self.data[self.n] = x
+        self.n += 1
+
+    def view(self, lo=0, hi=None):
+        ''' Returns a view on points lo..hi (defaults to all points). '''
+        return self.data[lo:self.n if hi is None else hi]
+
+    def __len__(self):
+        return self.n
+
+
+def closest(points, x):
+    ''' Returns (squared distance, position) of the point in the nonempty (n, dim) array closest to x. '''
+    d = ((points - x)**2).sum(axis=1)
+    i = d.argmin() # argmin returns the first minimum, matching the linear scan
+    return d[i], i
+
+
+class KDTreeIndex(NeighborIndex):
+    ''' k-d tree over the problem's state coordinates, using Euclidean distance.
+
+        Gives the same result as a linear scan for problems whose metric is (squared) Euclidean distance over the full state, such as Basic2DProblem and its subclasses.
+
+        The tree is static: states added after the last build are kept in a buffer that is scanned with a single vectorized pass, and the tree is rebuilt once the buffer grows past rebuild_ratio times the size of the tree. Rebuilds are geometrically spaced, so the amortized cost of an insert is O(log n).
+    '''
+
+    def __init__(self, problem, leaf_size=16, rebuild_ratio=0.125):
+        self.dim = len(problem.x_init)
+        self.weights = np.ones(self.dim) # relative scale of each coordinate, used to choose split dimensions
+        self.leaf_size = leaf_size
+        self.rebuild_ratio = rebuild_ratio
+
+        self.points = PointArray(self.dim)
+        self.n_indexed = 0 # states 0..n_indexed-1 are in the tree, the rest are in the buffer
+
+        # tree nodes, stored as parallel lists; a node is a leaf if split_dim is -1
+        self.split_dim = []
+        self.split_val = []
+        self.children = [] # (left, right) for internal nodes, (lo, hi) into tree_points for leaves
+        self.tree_points = None # indexed points, reordered so that each leaf is a contiguous slice
+        self.tree_ids = None # position of each point in tree_points
+        self.batch_tree = None # scipy cKDTree over tree_points, built by nearest_many on first use after each rebuild
+
+    def __len__(self):
+        return len(self.points)
+
+    def distances(self, points, x):
+        ''' Returns the distances from each point in the (n, dim) array to state x. '''
+        return ((points - x)**2).sum(axis=1)
+
+    def split_bound(self, d, diff, x):
+        ''' Returns a lower bound on the distance from x to any point on the far side of a split along dimension d, where diff is x[d] minus the split value. '''
+        return diff*diff
+
+    def add(self, x):
+        self.points.append(x)
+        if len(self.points) - self.n_indexed > max(self.leaf_size, self.rebuild_ratio*self.n_indexed):
+            self.rebuild()
+
+    def rebuild(self):
+        ''' Rebuilds the tree over all states added so far and empties the buffer. '''
+        points = self.points.view()
+        n = len(points)
+        ids = np.arange(n)
+
+        self.split_dim = []; self.split_val = []; self.children = []
+
+        # each pending entry is (node, lo, hi), a node to be built over ids[lo:hi]
+        self.split_dim.append(-1); self.split_val.append(0.); self.children.append(None)
+        pending = [(0, 0, n)]
+        while pending:
+            node, lo, hi = pending.pop()
+            if hi - lo <= self.leaf_size:
+                self.children[node] = (lo, hi)
+                continue
+
+            sub = points[ids[lo:hi]]
+            d = int(((sub.max(axis=0) - sub.min(axis=0))*self.weights).argmax())
+            mid = (hi - lo)//2
+            order = np.argpartition(sub[:,d], mid)
+            ids[lo:hi] = ids[lo:hi][order]
+
+            left = len(self.children); right = left + 1
+            for _ in (left, right):
+                self.split_dim.append(-1); self.split_val.append(0.); self.children.append(None)
+            self.split_dim[node] = d
+            self.split_val[node] = float(sub[order[mid], d])
+            self.children[node] = (left, right)
+            pending.append((left, lo, lo + mid))
+            pending.append((right, lo + mid, hi))
+
+        self.tree_points = points[ids]
+        self.tree_ids = ids
+        self.n_indexed = n
+        self.batch_tree = None
+
+    def nearest(self, x):
+        best_d = float('inf'); best_i = None
+        if len(self.points) > self.n_indexed:
+            dist = self.distances(self.points.view(self.n_indexed), x)
+            best_i = dist.argmin() # argmin returns the first minimum, matching the linear scan
+            best_d = dist[best_i]
+            best_i += self.n_indexed
+        if not self.n_indexed:
+            return None if best_i is None else int(best_i)
+
+        x = tuple(x)
+        split_dim = self.split_dim; split_val = self.split_val; children = self.children
+        stack = [(0, 0.)]
+        while stack:
+            node, bound = stack.pop()
+            if bound > best_d:
+                continue
+            d = split_dim[node]
+            if d < 0:
+                lo, hi = children[node]
+                dist = self.distances(self.tree_points[lo:hi], x)
+                j = dist.argmin()
+                if dist[j] <= best_d:
+                    # on ties, keep the earliest inserted state
+                    for k in np.flatnonzero(dist == dist[j]):
+                        i = self.tree_ids[lo + k]
+                        if dist[j] < best_d or i < best_i:
+                            best_d, best_i = dist[j], i
+                continue
+            diff = x[d] - split_val[node]
+            left, right = children[node]
+            far_bound = max(bound, self.split_bound(d, diff, x))
+            if diff < 0:
+                stack.append((right, far_bound))
+                stack.append((left, bound))
+            else:
+                stack.append((left, far_bound))
+                stack.append((right, bound))
+        return int(best_i)
+
+    def nearest_many(self, xs):
+        ''' Answers the whole batch with one scipy cKDTree query over the tree and one (k, m) distance computation over the buffer.
+
+            cKDTree computes distances in a different order than distances(), so the two closest tree points are compared again with distances(); queries whose two closest points are within rounding error of each other fall back to nearest(), which resolves ties exactly.
+        '''
+        xs = np.asarray(xs, dtype=float).reshape(-1, self.dim)
+        if not len(self.points):
+            return [None]*len(xs)
+        best_d = np.full(len(xs), np.inf)
+        best_i = np.zeros(len(xs), dtype=int)
+        exact = np.ones(len(xs), dtype=bool)
+        if self.n_indexed:
+            if self.batch_tree is None:
+                from scipy.spatial import cKDTree
+                self.batch_tree = cKDTree(self.tree_points, leafsize=self.leaf_size)
+            k = min(2, self.n_indexed)
+            _, j = self.batch_tree.query(xs, k=k)
+            j = j.reshape(len(xs), k)
+            d = ((self.tree_points[j] - xs[:,None,:])**2).sum(axis=2)
+            best_d = d[:,0]
+            best_i = self.tree_ids[j[:,0]]
+            if k > 1:
+                exact = np.abs(d[:,1] - d[:,0]) > 1e-9*(d[:,0] + d[:,1])
+        if len(self.points) > self.n_indexed:
+            buffer = self.points.view(self.n_indexed)
+            dist = ((buffer - xs[:,None,:])**2).sum(axis=2)
+            j = dist.argmin(axis=1) # argmin returns the first minimum, matching the linear scan
+            d = dist[np.arange(len(xs)), j]
+            closer = d < best_d # on ties, the tree holds the earlier state
+            best_d = np.where(closer, d, best_d)
+            best_i = np.where(closer, j + self.n_indexed, best_i)
+        nearest = best_i.tolist()
+        for q in np.flatnonzero(~exact).tolist():
+            nearest[q] = self.nearest(xs[q])
+        return nearest
+
+    def near(self, x, radius):
+        r2 = radius*radius
+        found = []
+        if len(self.points) > self.n_indexed:
+            found.extend((np.flatnonzero(self.distances(self.points.view(self.n_indexed), x) <= r2) + self.n_indexed).tolist())
+        if not self.n_indexed:
+            return found
+
+        x = tuple(x)
+        split_dim = self.split_dim; split_val = self.split_val; children = self.children
+        stack = [(0, 0.)]
+        while stack:
+            node, bound = stack.pop()
+            if bound > r2:
+                continue
+            d = split_dim[node]
+            if d < 0:
+                lo, hi = children[node]
+                found.extend(self.tree_ids[lo:hi][self.distances(self.tree_points[lo:hi], x) <= r2].tolist())
+                continue
+            diff = x[d] - split_val[node]
+            left, right = children[node]
+            far_bound = max(bound, self.split_bound(d, diff, x))
+            stack.append((left, far_bound if diff >= 0 else bound))
+            stack.append((right, far_bound if diff < 0 else bound))
+        found.sort()
+        return found
+
+
+class SE2Index(KDTreeIndex):
+    ''' k-d tree for states (x, y, r) in R^2 x S^1, using the metric of MovingRectangleProblem: squared Euclidean distance in x and y plus the squared wrapped rotation difference, scaled so that a full turn weighs as much as the width of the map.
+
+        Distances are computed with the same floating point operations as MovingRectangleProblem.metric, so results match a linear scan exactly. Splits along the rotation account for wraparound at +-pi; rotations are assumed to lie in [-pi, pi], as enforced by MovingRectangleProblem.valid_state.
+    '''
+
+    def __init__(self, problem, leaf_size=16, rebuild_ratio=0.125):
+        super(SE2Index, self).__init__(problem, leaf_size, rebuild_ratio)
+        self.width = problem.x_max - problem.x_min
+        self.weights[2] = self.width/(2*math.pi)
+
+    def nearest_many(self, xs):
+        ''' Answers the queries one at a time, as cKDTree only supports Minkowski distances. '''
+        return [self.nearest(x) for x in xs]
+
+    def distances(self, points, x):
+        r = np.remainder(x[2] - points[:,2] + math.pi, 2*math.pi) - math.pi
+        r = r*self.width/(2*math.pi)
+        return (x[0] - points[:,0])**2 + (x[1] - points[:,1])**2 + r**2
+
+    def split_bound(self, d, diff, x):
+        if d != 2:
+            return diff*diff
+        # the far side is [split, pi] if x is below the split and [-pi, split] otherwise; it can be reached directly or across +-pi
+        if diff < 0:
+            r = min(-diff, x[2] + math.pi)
+        else:
+            r = min(diff, math.pi - x[2])
+        r = max(r, 0.)*self.weights[2]
+        return r*r*(1 - 1e-9) # slack for rounding, so that ties are never pruned
+
+
+class GridIndex(NeighborIndex):
+    ''' Uniform grid of buckets over a bounded 2-D state space, using Euclidean distance over the first two coordinates.
+
+        Gives the same result as a linear scan for Basic2DProblem and its subclasses, e.g. BitmapProblem. Queries search the buckets ring by ring outward from the query's bucket, and stop once no bucket further out can hold a closer state. With a cell size close to the problem's max_step, neighboring tree nodes lie a few buckets apart, so inserts and queries take O(1) time on average.
+
+        Queries far from every indexed state (e.g. while the tree is small) would visit many empty buckets; once the ring search has visited more buckets than there are states, the remaining search is done with a single vectorized scan instead.
+
+        Batched queries (nearest_many) are answered one at a time, so solvers run with batch_size > 1 gain nothing from this index; use KDTreeIndex or no index instead.
+    '''
+
+    def __init__(self, problem, cell_size=None):
+        self.cell = float(cell_size or problem.max_step)
+        self.x_min = problem.x_min; self.y_min = problem.y_min
+        self.nx = int((problem.x_max - problem.x_min)//self.cell) + 1
+        self.ny = int((problem.y_max - problem.y_min)//self.cell) + 1
+
+        self.buckets = [[] for _ in range(self.nx*self.ny)] # positions of the states in each cell, row-major
+        self.states = []
+        self.points = PointArray(2)
+
+    def __len__(self):
+        return len(self.states)
+
+    def cell_of(self, x):
+        ''' Returns (column, row) of the cell containing x, clamped to the grid. '''
+        cx = int((x[0] - self.x_min)//self.cell)
+        cy = int((x[1] - self.y_min)//self.cell)
+        return min(max(cx, 0), self.nx-1), min(max(cy, 0), self.ny-1)
+
+    def add(self, x):
+        cx, cy = self.cell_of(x)
+        self.buckets[cy*self.nx + cx].append(len(self.states))
+        self.states.append(x)
+        self.points.append(x[:2])
+
+    def ring(self, cx, cy, r):
+        ''' Yields the buckets of the cells at Chebyshev distance r from cell (cx, cy). '''
+        nx = self.nx; buckets = self.buckets
+        if r == 0:
+            yield buckets[cy*nx + cx]
+            return
+        x_lo = max(cx-r, 0); x_hi = min(cx+r, nx-1)
+        for y in (cy-r, cy+r):
+            if 0 <= y < self.ny:
+                for i in range(y*nx + x_lo, y*nx + x_hi + 1):
+                    yield buckets[i]
+        for x in (cx-r, cx+r):
+            if 0 <= x < nx:
+                for y in range(max(cy-r+1, 0), min(cy+r, self.ny)):
+                    yield buckets[y*nx + x]
+
+    def nearest(self, x):
+        n = len(self.states)
+        if not n:
+            return None
+        cx, cy = self.cell_of(x)
+        x0 = x[0]; x1 = x[1]
+        states = self.states
+        best_d = float('inf'); best_i = None
+
+        max_r = max(cx, self.nx-1-cx, cy, self.ny-1-cy)
+        visited = 0
+        for r in range(max_r + 1):
+            # every state in ring r or further is at least r-1 cells away from x
+            if r and best_d < ((r-1)*self.cell)**2:
+                break
+            visited += 8*r or 1
+            if visited > n:
+                d, i = closest(self.points.view(), (x0, x1))
+                return int(i)
+            for bucket in self.ring(cx, cy, r):
+                for i in bucket:
+                    s = states[i]
+                    dist = (x0-s[0])**2 + (x1-s[1])**2
+                    if dist < best_d or (dist == best_d and i < best_i):
+                        best_d = dist; best_i = i
+        return best_i
+
+    def near(self, x, radius):
+        r2 = radius*radius
+        x0 = x[0]; x1 = x[1]
+        states = self.states; buckets = self.buckets; nx = self.nx
+        cx_lo, cy_lo = self.cell_of((x0 - radius, x1 - radius))
+        cx_hi, cy_hi = self.cell_of((x0 + radius, x1 + radius))
+        found = []
+        for cy in range(cy_lo, cy_hi + 1):
+            for bucket in buckets[cy*nx + cx_lo:cy*nx + cx_hi + 1]:
+                for i in bucket:
+                    s = states[i]
+                    if (x0-s[0])**2 + (x1-s[1])**2 <= r2:
+                        found.append(i)
+        found.sort()
+        return found
@@ -0,0 +1,250 @@
+''' Module prm provides a multi-query probabilistic roadmap planner. To use it, initialize a PRM with a Problem instance, and call query(x_start, x_goal) for each pair of states; the roadmap is built once, on the first PRM for a given map and parameters, and cached on disk.
+
+    Roadmap nodes are valid random states. Two nodes are joined by an edge if they are within radius of each other and a single call to P.new_state leads exactly from one to the other, as for RRTStar; the cost of an edge is its length, sqrt(P.metric). BitmapProblem only checks edges with check_edges=True, so use that option for roadmaps whose edges must be collision-free.
+
+    Queries run A* with the ALT heuristic (Goldberg and Harrelson, 2005): the roadmap stores the cost of the shortest path from a few landmark nodes to every node, and by the triangle inequality these give lower bounds on the cost to the goal that are much tighter than the straight-line distance in maps like the maze.
+'''
+
+import os, hashlib, math
+from heapq import heappush, heappop
+import numpy as np
+from neighbors import KDTreeIndex
+
+
+class PRM(object):
+    ''' Probabilistic roadmap, answering queries with A*. '''
+
+    def __init__(self, problem, n_nodes=5000, radius=None, max_neighbors=None, landmarks=8, index=KDTreeIndex, cache_dir='.prm_cache'):
+        ''' Input arguments:
+            - problem: Problem instance. Its start and goal states are not used.
+            - n_nodes: number of roadmap nodes
+            - radius: maximum length of an edge; defaults to P.max_step, the longest step new_state can take
+            - max_neighbors: if set, each node is only joined to its max_neighbors nearest nodes within radius (and to the nodes it is among the nearest of). Fewer edges make queries faster, and paths slightly longer.
+            - landmarks: number of landmark nodes of the A* heuristic
+            - index: NeighborIndex class used to find the neighbors of each node while building the roadmap. Use SE2Index for MovingRectangleProblem. Queries compare the start and goal with every node with P.metric_many instead.
+            - cache_dir: directory where roadmaps are cached, keyed by the problem's map and parameters (see problem_key), n_nodes, radius, max_neighbors and landmarks. If None, the roadmap is always built.
+        '''
+        self.P = problem
+        self.n_nodes = n_nodes
+        self.radius = radius or problem.max_step
+        self.max_neighbors = max_neighbors
+        self.n_landmarks = landmarks
+        self.index_class = index
+        self.expanded = 0 # nodes expanded by A* in the last query
+
+        roadmap = self.load_roadmap(cache_dir)
+        self.states = roadmap['states']
+        indptr = roadmap['indptr'].tolist(); indices = roadmap['indices'].tolist(); costs = roadmap['costs'].tolist()
+        self.adjacency = [zip(indices[a:b], costs[a:b]) for a, b in zip(indptr, indptr[1:])] # list of (node, cost) of the edges of each node
+        self.components = roadmap['components']
+        self.landmarks = roadmap['landmarks']
+
+    def load_roadmap(self, cache_dir):
+        ''' Returns the roadmap as a dictionary of arrays, loading it from cache_dir if it was built before for the same problem and parameters, and storing it there otherwise.
+
+            The edges of node i lead to nodes indices[indptr[i]:indptr[i+1]], at costs costs[indptr[i]:indptr[i+1]]. components holds the connected component label of each node, and landmarks the costs of the shortest paths from each landmark to each node (see select_landmarks).
+        '''
+        if cache_dir is None:
+            return self.build()
+
+        key = problem_key(self.P)
+        key.update(repr((self.n_nodes, self.radius, self.max_neighbors, self.n_landmarks)))
+        path = os.path.join(cache_dir, 'prm_%s.npz' % key.hexdigest())
+        if os.path.exists(path):
+            with np.load(path) as f:
+                return dict(f.items())
+
+        roadmap = self.build()
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        np.savez(path, **roadmap)
+        return roadmap
+
+    def build(self):
+        ''' Samples the roadmap nodes, connects every pair of nodes within radius that new_state joins in a single step, and selects the landmarks. Returns the arrays described in load_roadmap. '''
+        states = []
+        while len(states) < self.n_nodes:
+            xs = self.P.random_states(self.n_nodes - len(states))
+            states.extend(x for x, valid in zip(xs, self.P.valid_states(xs)) if valid)
+
+        index = self.index_class(self.P)
+        for x in states:
+            index.add(x)
+        pairs = set()
+        for i, x in enumerate(states):
+            near = [j for j in index.near(x, self.radius) if j != i]
+            if self.max_neighbors is not None and len(near) > self.max_neighbors:
+                near = [near[k] for k in self.P.metric_many([states[j] for j in near], x).argsort(kind='mergesort')[:self.max_neighbors]]
+            pairs.update((min(i, j), max(i, j)) for j in near)
+        pairs = sorted(pairs)
+        xs, us = self.P.new_states([states[i] for i, j in pairs], [states[j] for i, j in pairs])
+        edges = [(i, j) for (i, j), x in zip(pairs, xs) if x == states[j]]
+        costs = [math.sqrt(self.P.metric(states[i], states[j])) for i, j in edges]
+
+        # both directions of each edge, sorted by source node
+        edges = np.array(edges + [(j, i) for i, j in edges], dtype=np.int32).reshape(-1, 2)
+        order = np.lexsort((edges[:,1], edges[:,0]))
+        edges = edges[order]
+        indptr = np.searchsorted(edges[:,0], np.arange(len(states)+1)).astype(np.int32)
+        indices = edges[:,1].copy()
+        costs = np.array(costs + costs)[order]
+        labels = components(indptr, indices)
+
+        return {'states': np.array(states), 'indptr': indptr, 'indices': indices, 'costs': costs, 'components': labels,
+                'landmarks': select_landmarks(self.n_landmarks, indptr.tolist(), indices.tolist(), costs.tolist(), labels)}
+
+    def state(self, i):
+        return tuple(self.states[i].tolist())
+
+    def connections(self, x, distances, to_x=False):
+        ''' Returns {node: cost} for the roadmap nodes within radius of state x that new_state joins to x in a single step: from x to the node, or from the node to x if to_x is set. distances holds the metric from every node to x. '''
+        result = {}
+        for i in np.flatnonzero(distances <= self.radius**2).tolist():
+            a, b = (self.state(i), x) if to_x else (x, self.state(i))
+            if self.P.new_state(a, b)[0] == b:
+                result[i] = math.sqrt(distances[i])
+        return result
+
+    def query(self, x_start, x_goal):
+        ''' Returns (states, inputs) for the shortest path on the roadmap from x_start to x_goal, joined to the roadmap as its nodes are, or (None, None) if there is no such path. inputs[i] is the input new_state takes from states[i] to states[i+1]. '''
+        self.expanded = 0
+        x, u = self.P.new_state(x_start, x_goal)
+        if x == x_goal:
+            return [x_start, x_goal], [u]
+
+        to_goal = self.P.metric_many(self.states, x_goal)
+        sources = self.connections(x_start, self.P.metric_many(self.states, x_start))
+        targets = self.connections(x_goal, to_goal, to_x=True)
+        reachable = set(self.components[i] for i in targets)
+        sources = dict((i, c) for i, c in sources.items() if self.components[i] in reachable)
+        if not sources:
+            return None, None
+
+        node = self.astar(sources, targets, self.heuristic(np.sqrt(to_goal), targets))
+        states = [x_start] + [self.state(i) for i in node] + [x_goal]
+        return states, [self.P.new_state(a, b)[1] for a, b in zip(states, states[1:])]
+
+    def heuristic(self, straight, targets):
+        ''' Returns a list of lower bounds on the cost from each node to the goal, reached with cost targets[t] from a node t of targets.
+
+            A bound is the straight-line distance to the goal, or, for a landmark with costs d, min(d[t] + targets[t]) - d[v] or d[v] - max(d[t] - targets[t]), by the triangle inequality. Each bound is consistent, and so is their maximum. Landmark bounds are only used if the targets are in the landmarks' component, and only hold for nodes in that component, the only ones A* visits.
+        '''
+        t = np.array(targets.keys())
+        c = np.array(targets.values())
+        if not len(self.landmarks) or not np.isfinite(self.landmarks[0,t[0]]):
+            return straight.tolist()
+        d = self.landmarks
+        with np.errstate(invalid='ignore'): # inf - inf outside the component
+            bounds = np.maximum(((d[:,t] + c).min(axis=1)[:,None] - d).max(axis=0),
+                                (d - (d[:,t] - c).max(axis=1)[:,None]).max(axis=0))
+        return np.fmax(straight, bounds).tolist()
+
+    def astar(self, sources, targets, h):
+        ''' Returns the list of nodes of the cheapest path starting with cost sources[i] at a node i of sources and ending with cost targets[j] at a node j of targets, using the consistent heuristic h. Returns None if no node of targets is reached, e.g. if sources and targets are in different components. '''
+        adjacency = self.adjacency
+        g = [float('inf')]*len(adjacency)
+        parent = [-1]*len(adjacency)
+        for i, c in sources.items():
+            g[i] = c
+        heap = [(c + h[i], c, i) for i, c in sources.items()]
+        heap.sort()
+        best = float('inf'); last = None
+        while heap:
+            f, c, i = heappop(heap)
+            if f >= best:
+                break
+            if c > g[i]:
+                continue # stale entry
+            self.expanded += 1
+            if i in targets and c + targets[i] < best:
+                best = c + targets[i]; last = i
+            for j, cost in adjacency[i]:
+                cj = c + cost
+                if cj < g[j] and cj < best:
+                    g[j] = cj
+                    parent[j] = i
+                    heappush(heap, (cj + h[j], cj, j))
+
+        if last is None:
+            return None # no target reached
+        path = []
+        while last != -1:
+            path.append(last)
+            last = parent[last]
+        path.reverse()
+        return path
+
+
+def components(indptr, indices):
+    ''' Returns an array of the connected component label of each node of a roadmap, with edges given as in PRM.load_roadmap. The label of a component is its first node. '''
+    labels = np.full(len(indptr)-1, -1, dtype=np.int32)
+    for start in xrange(len(labels)):
+        if labels[start] != -1:
+            continue
+        labels[start] = start
+        pending = [start]
+        while pending:
+            i = pending.pop()
+            neighbors = indices[indptr[i]:indptr[i+1]]
+            neighbors = neighbors[labels[neighbors] == -1]
+            labels[neighbors] = start
+            pending.extend(neighbors.tolist())
+    return labels
+
+
+def dijkstra(indptr, indices, costs, source):
+    ''' Returns an array of the costs of the shortest paths from node source to every node, inf for nodes it does not reach. '''
+    dist = [float('inf')]*(len(indptr)-1)
+    dist[source] = 0.
+    heap = [(0., source)]
+    while heap:
+        c, i = heappop(heap)
+        if c > dist[i]:
+            continue
+        for k in xrange(indptr[i], indptr[i+1]):
+            j = indices[k]
+            cj = c + costs[k]
+            if cj < dist[j]:
+                dist[j] = cj
+                heappush(heap, (cj, j))
+    return np.array(dist)
+
+
+def select_landmarks(k, indptr, indices, costs, labels):
+    ''' Chooses up to k landmarks in the largest component of a roadmap, and returns the array of the costs of the shortest paths from each landmark to each node, inf outside the component.
+
+        Landmarks are chosen by farthest-point selection: the first is the node farthest from the first node of the component, and each next one the node farthest from all landmarks chosen so far.
+    '''
+    if not len(labels):
+        return np.zeros((0, 0))
+    largest = np.bincount(labels).argmax()
+    farthest = dijkstra(indptr, indices, costs, int(largest))
+    rows = []
+    for i in xrange(k):
+        node = int(np.where(np.isfinite(farthest), farthest, -1).argmax())
+        if farthest[node] <= 0:
+            break # every node of the component is a landmark
+        rows.append(dijkstra(indptr, indices, costs, node))
+        farthest = np.minimum(farthest, rows[-1]) if i else rows[-1]
+    return np.array(rows).reshape(len(rows), len(labels))
+
+
+# attributes that problem_key leaves out: the start, goal and goal tolerance, which roadmaps do not depend on, and arrays derived from other attributes (the map in free, or the list of obstacles)
+UNKEYED = frozenset(['x_init', 'x_goal', 'goal_tol',
+                     'blocked', 'clearance', 'free_pixels', # BitmapProblem
+                     'cspace', 'free_cells', 'collision_grid', 'collision_grid_complex', # MovingRectangleProblem
+                     'centers', 'radii', 'radii2', 'cell', 'nx', 'ny', 'buckets', 'cell_table']) # ObstacleProblem
+
+
+def problem_key(problem):
+    ''' Returns a hashlib object hashing the class of the problem and its number, string, tuple, list and array attributes, except those in UNKEYED. This covers the map and parameters of the bundled problems. '''
+    key = hashlib.sha1(type(problem).__name__)
+    for name, value in sorted(vars(problem).items()):
+        if name in UNKEYED:
+            continue
+        if isinstance(value, np.ndarray):
+            key.update(repr((name, value.shape, value.dtype.str)))
+            key.update(np.ascontiguousarray(value).tostring())
+        elif value is None or isinstance(value, (bool, int, long, float, str, tuple, list)):
+            key.update(repr((name, value)))
+    return key
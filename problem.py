@@ -2,8 +2,48 @@ import random
 import math
 from vis import Visualizer
 
+import numpy as np
 from PIL import Image
 
+def numpy_random():
+    ''' Returns a NumPy random generator seeded from the random module, so that random.seed also makes NumPy draws reproducible. '''
+    return np.random.RandomState(random.getrandbits(32))
+
+
+class SampleBuffer(object):
+    ''' Buffer of random states drawn in bulk. draw(rng, k) must return a list of k states drawn with the NumPy generator rng, which is seeded from the random module at every refill.
+
+        States already in the buffer are not affected by random.seed; call clear() after reseeding to make the following samples depend only on the seed.
+    '''
+
+    def __init__(self, draw, size=4096):
+        self.draw = draw
+        self.size = size
+        self.buffer = [] # next states are popped from the end
+
+    def refill(self, k=0):
+        ''' Draws max(size, k) new states, to be returned after the ones already in the buffer. '''
+        states = self.draw(numpy_random(), max(self.size, k))
+        states.reverse()
+        self.buffer = states + self.buffer
+
+    def sample(self):
+        if not self.buffer:
+            self.refill()
+        return self.buffer.pop()
+
+    def samples(self, k):
+        if len(self.buffer) < k:
+            self.refill(k)
+        states = self.buffer[-k:] if k else []
+        del self.buffer[len(self.buffer)-k:]
+        states.reverse()
+        return states
+
+    def clear(self):
+        self.buffer = []
+
+
 class Problem(object):
     ''' Interface for Problem classes. '''
 
@@ -48,6 +88,31 @@ class Problem(object):
         ''' Initializes and returns Visualizer with specific problem parameters.'''
         raise NotImplementedError( "Should have implemented this" )
 
+    # Batched versions of the methods above, used by the batched planners. The
+    # default implementations call the scalar methods; problems may override
+    # them with vectorized versions that give the same results.
+
+    def random_states(self, k):
+        ''' Returns a list of k random states. '''
+        return [self.random_state() for i in xrange(k)]
+
+    def new_states(self, x1s, x2s, reverse=False):
+        ''' Batched new_state: returns lists (xs, us), where (xs[i], us[i]) is new_state(x1s[i], x2s[i], reverse). '''
+        steps = [self.new_state(x1, x2, reverse=reverse) for x1, x2 in zip(x1s, x2s)]
+        return [x for x, u in steps], [u for x, u in steps]
+
+    def valid_states(self, xs):
+        ''' Batched valid_state: returns a boolean array whose i-th element is valid_state(xs[i]). '''
+        return np.array([bool(self.valid_state(x)) for x in xs], dtype=bool)
+
+    def metric_many(self, xs, x):
+        ''' Returns an array whose i-th element is metric(xs[i], x), for a sequence or (n, d) array of states xs. '''
+        return np.array([self.metric(x1, x) for x1 in xs], dtype=float)
+
+    def metric_matrix(self, xs, ys):
+        ''' Returns the (len(ys), len(xs)) array whose (j, i) element is metric(xs[i], ys[j]). '''
+        return np.array([self.metric_many(xs, y) for y in ys], dtype=float).reshape(len(ys), len(xs))
+
 
 class Basic2DProblem(Problem):
     ''' Problem with 2-D state space and no obstacles. '''
@@ -76,6 +141,47 @@ class Basic2DProblem(Problem):
         ''' Default metric for 2D problem: Euclidean distance '''
         return (x2[0]-x1[0])**2+(x2[1]-x1[1])**2
 
+    def random_states(self, k):
+        rng = numpy_random()
+        return zip(rng.uniform(self.x_min, self.x_max, k).tolist(), rng.uniform(self.y_min, self.y_max, k).tolist())
+
+    def metric_many(self, xs, x):
+        xs = np.asarray(xs, dtype=float)
+        return (x[0]-xs[:,0])**2 + (x[1]-xs[:,1])**2
+
+    def metric_matrix(self, xs, ys):
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float).reshape(-1, 2)
+        return (ys[:,0,None]-xs[:,0])**2 + (ys[:,1,None]-xs[:,1])**2
+
+    def valid_states(self, xs):
+        xs = np.asarray(xs, dtype=float).reshape(-1, 2)
+        return (self.x_min <= xs[:,0]) & (xs[:,0] <= self.x_max) & (self.y_min <= xs[:,1]) & (xs[:,1] <= self.y_max)
+
+    def new_states(self, x1s, x2s, reverse=False):
+        ''' Vectorized new_state. Steps shorter than max_step return x2s[i] itself, as new_state does. '''
+        a = np.asarray(x1s, dtype=float).reshape(-1, 2); b = np.asarray(x2s, dtype=float).reshape(-1, 2)
+        u = b - a
+        n = np.sqrt((b[:,0]-a[:,0])**2 + (b[:,1]-a[:,1])**2)
+        short = n < self.max_step
+        u[~short] = u[~short]*self.max_step/n[~short,None]
+        x = np.where(short[:,None], b, a + u)
+        valid = self.valid_states(x)
+        return self.steps_to_lists(x2s, x, u, short, valid, reverse)
+
+    @staticmethod
+    def steps_to_lists(x2s, x, u, short, valid, reverse):
+        ''' Converts arrays of steps into the lists returned by new_states, with (None, None) for invalid steps. '''
+        if reverse:
+            u = -u
+        xs = []; us = []
+        for i, (xi, ui) in enumerate(zip(x.tolist(), u.tolist())):
+            if valid[i]:
+                xs.append(x2s[i] if short[i] else tuple(xi)); us.append(tuple(ui))
+            else:
+                xs.append(None); us.append(None)
+        return xs, us
+
     def valid_state(self, x):
         ''' Returns True if x is within problem's 2D bounds. '''
         return (self.x_min <= x[0] <= self.x_max) and (self.y_min <= x[1] <= self.y_max)
@@ -91,6 +197,15 @@ class Basic2DProblem(Problem):
 
             If the state found is not valid, returns (None, None).
         '''
+        x, u = self.steer(x1, x2, reverse)
+
+        if not self.valid_state(x):
+            return None, None
+
+        return x, u
+
+    def steer(self, x1, x2, reverse=False):
+        ''' Returns the step (x, u) from x1 toward x2 as new_state does, without checking whether x is valid. '''
 
         # get desired step
         u = (x2[0]-x1[0], x2[1]-x1[1])
@@ -103,9 +218,6 @@ class Basic2DProblem(Problem):
             u = (u[0]*self.max_step/n, u[1]*self.max_step/n)
             x = (x1[0]+u[0],x1[1]+u[1])
 
-        if not self.valid_state(x):
-            return None, None
-
         if reverse:
             u = (-u[0],-u[1])
 
@@ -123,63 +235,235 @@ class Basic2DProblem(Problem):
 class BitmapProblem(Basic2DProblem):
     ''' Problem with 2-D state space, using a black-and-white bitmap where black denotes obstacle regions and white denotes free regions. '''
 
-    def __init__(self, image, init, goal, max_step, goal_tolerance=20):
+    def __init__(self, image, init, goal, max_step, goal_tolerance=20, check_edges=False, clearance=False, free_sampling=False):
         ''' Takes a PIL.Image.Image object as a map.
 
-            White pixels are interpreted as allowable states.
+            White pixels are interpreted as allowable states. The map is converted once into a boolean occupancy array, self.free, indexed as free[y, x]; all collision checks read from it. Like PIL, non-integer coordinates are truncated to the pixel containing them.
+
+            If check_edges is True, new_state also rejects steps whose straight-line edge crosses an obstacle, not only steps whose endpoint is in one.
+
+            If clearance is True, a distance transform of the map is computed (this requires scipy), see clearance_at. Steps from states whose clearance exceeds max_step are then accepted without any further collision checks.
+
+            If free_sampling is True, random_state samples free pixels only, uniformly, instead of the whole image. Samples are drawn in bulk into self.sampler, a SampleBuffer.
         '''
+        self.check_edges = check_edges
         assert isinstance(image, Image.Image), "bitmap must be a PIL.Image.Image"
         self.map = image.convert('1')
+        self.free = np.ascontiguousarray(np.array(self.map, dtype=bool)) # True for white pixels
+
+        # summed-area table of obstacle pixels: blocked[y, x] is the number of obstacle pixels above and left of (x, y), exclusive
+        self.blocked = np.zeros((self.free.shape[0]+1, self.free.shape[1]+1), dtype=np.int32)
+        self.blocked[1:,1:] = (~self.free).cumsum(axis=0).cumsum(axis=1)
+
+        self.clearance = self.distance_transform() if clearance else None
+
+        self.free_pixels = np.flatnonzero(self.free) if free_sampling else None # flat indices into free, for draw_free_states
+        self.sampler = SampleBuffer(self.draw_free_states) if free_sampling else None
 
-        assert self.map.getpixel(init) != 0, "initial state is in an obstacle"
-        assert self.map.getpixel(goal) != 0, "goal state is in an obstacle"
+        assert self.free[int(init[1]), int(init[0])], "initial state is in an obstacle"
+        assert self.free[int(goal[1]), int(goal[0])], "goal state is in an obstacle"
 
         super(BitmapProblem, self).__init__(0, image.size[0]-1, 0, image.size[1]-1, init, goal, max_step, goal_tolerance)
 
     def random_state(self):
-        ''' Return a random state within 2-D bounds (i.e. pixel in image). ''' 
+        ''' Return a random state within 2-D bounds (i.e. pixel in image), or a random free pixel if free_sampling is set. ''' 
+        if self.sampler is not None:
+            return self.sampler.sample()
         x = random.randint(self.x_min, self.x_max)
         y = random.randint(self.y_min, self.y_max)
         return (x, y)
 
+    def random_states(self, k):
+        if self.sampler is not None:
+            return self.sampler.samples(k)
+        rng = numpy_random()
+        return zip(rng.randint(self.x_min, self.x_max+1, k).tolist(), rng.randint(self.y_min, self.y_max+1, k).tolist())
+
+    def draw_free_states(self, rng, k):
+        ''' Returns k free pixels drawn uniformly with the NumPy generator rng, as (x, y) tuples. '''
+        y, x = np.divmod(self.free_pixels[rng.randint(len(self.free_pixels), size=k)], self.free.shape[1])
+        return zip(x.tolist(), y.tolist())
+
+    def distance_transform(self):
+        ''' Returns the Euclidean distance from every pixel to the nearest obstacle pixel, as a float array indexed [y, x]. Pixels outside the map count as obstacles. '''
+        from scipy.ndimage import distance_transform_edt
+
+        padded = np.zeros((self.free.shape[0]+2, self.free.shape[1]+2), dtype=bool)
+        padded[1:-1,1:-1] = self.free
+        return distance_transform_edt(padded)[1:-1,1:-1]
+
+    def clearance_at(self, x):
+        ''' Returns the clearance c of state x, which must be within bounds. Requires the problem to be built with clearance=True.
+
+            Distances are measured between pixel indices, so for any point in the pixel of x:
+            - every point within distance c-2 is within bounds and in a free pixel;
+            - some point within distance c is in an obstacle pixel or out of bounds.
+        '''
+        return self.clearance.item(int(x[1]), int(x[0]))
+
     def new_state(self, x1, x2, reverse=False):
-        return super(BitmapProblem, self).new_state(x1, x2, reverse)
+        ''' Takes a step from x1 toward x2, as Basic2DProblem.new_state does. If check_edges is set, the whole edge from x1 to the new state must be free. '''
+        if self.clearance is not None and self.clearance_at(x1) - 2 > self.max_step:
+            # every state within max_step of x1 is free, and so is every edge from x1
+            return self.steer(x1, x2, reverse)
+
+        x, u = super(BitmapProblem, self).new_state(x1, x2, reverse)
+        if x is not None and self.check_edges and not self.valid_edge(x1, x):
+            return None, None
+        return x, u
+
+    def new_states(self, x1s, x2s, reverse=False):
+        xs, us = super(BitmapProblem, self).new_states(x1s, x2s, reverse)
+        if self.check_edges:
+            steps = [i for i, x in enumerate(xs) if x is not None]
+            if steps:
+                valid = self.valid_edges([x1s[i][:2] for i in steps], [xs[i][:2] for i in steps])
+                for i in np.asarray(steps)[~valid]:
+                    xs[i] = us[i] = None
+        return xs, us
 
     def valid_state(self, x):
         ''' Determine whether state x is within bounds and not in an obstacle region. '''
-        return (super(BitmapProblem, self).valid_state(x) and self.map.getpixel(x) != 0)
+        return (self.x_min <= x[0] <= self.x_max and self.y_min <= x[1] <= self.y_max
+                and self.free.item(int(x[1]), int(x[0])))
+
+    def valid_states(self, xs):
+        ''' Batched valid_state: takes an (n, 2) array of states and returns a boolean array of length n. '''
+        xs = np.asarray(xs).reshape(-1, 2)
+        x = xs[:,0]; y = xs[:,1]
+        valid = (self.x_min <= x) & (x <= self.x_max) & (self.y_min <= y) & (y <= self.y_max)
+        valid[valid] = self.free[y[valid].astype(int), x[valid].astype(int)]
+        return valid
+
+    def box_free(self, x0, y0, x1, y1):
+        ''' Determines whether all pixels in columns x0..x1 and rows y0..y1 (inclusive) are free, in O(1) time. '''
+        b = self.blocked
+        return b.item(y1+1, x1+1) - b.item(y0, x1+1) - b.item(y1+1, x0) + b.item(y0, x0) == 0
+
+    def valid_edge(self, x1, x2):
+        ''' Determines whether every pixel crossed by the segment from x1 to x2 is free. Both states must be within bounds.
+
+            Edges whose bounding box is free are accepted with a single lookup. Other edges are traversed pixel by pixel, in the same way as valid_edges, stopping at the first obstacle.
+        '''
+        ax = x1[0]; ay = x1[1]; bx = x2[0]; by = x2[1]
+        if self.box_free(int(min(ax, bx)), int(min(ay, by)), int(max(ax, bx)), int(max(ay, by))):
+            return True
+
+        dx = float(bx - ax); dy = float(by - ay) # states may be integer tuples
+        t = [0., 1.]
+        if dx:
+            t.extend([(k - ax)/dx for k in xrange(int(math.floor(min(ax, bx)))+1, int(math.ceil(max(ax, bx))))])
+        if dy:
+            t.extend([(k - ay)/dy for k in xrange(int(math.floor(min(ay, by)))+1, int(math.ceil(max(ay, by))))])
+        t.sort()
+
+        free = self.free
+        if not (free.item(int(ay), int(ax)) and free.item(int(by), int(bx))):
+            return False
+        for i in xrange(len(t)-1):
+            mid = (t[i] + t[i+1])/2
+            if not free.item(int(ay + mid*dy), int(ax + mid*dx)):
+                return False
+        return True
+
+    def valid_edges(self, a, b):
+        ''' Batched valid_edge: takes two (n, 2) arrays of states within bounds, and returns a boolean array whose i-th element is True if the segment from a[i] to b[i] only crosses free pixels.
+
+            The segments are rasterized exactly (every pixel the segment passes through is tested), by splitting each segment at its crossings with the pixel grid and testing the pixels containing the midpoint of every piece and the two endpoints.
+        '''
+        a = np.asarray(a, dtype=float); b = np.asarray(b, dtype=float)
+        n = len(a)
+        d = b - a
+        k = int(np.ceil(np.abs(d).max())) + 1 if n else 0 # bound on the number of grid lines crossed along each axis
+
+        # parameters t in (0, 1) at which each segment crosses a grid line; unused slots are set to 1
+        lines = np.floor(np.minimum(a, b))[:,:,None] + 1 + np.arange(k)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (lines - a[:,:,None])/d[:,:,None]
+        t[lines >= np.maximum(a, b)[:,:,None]] = 1.
+        t = np.sort(np.concatenate((np.zeros((n, 1)), t.reshape(n, 2*k), np.ones((n, 1))), axis=1), axis=1)
+
+        mid = np.concatenate(((t[:,1:] + t[:,:-1])/2, t[:,:1], t[:,-1:]), axis=1)
+        px = (a[:,0,None] + mid*d[:,0,None]).astype(int)
+        py = (a[:,1,None] + mid*d[:,1,None]).astype(int)
+        return self.free[py, px].all(axis=1)
 
     def setup_vis(self):
         return Visualizer(self.x_min, self.x_max, self.y_min, self.y_max, self.map)
 
 
 class ObstacleProblem(Basic2DProblem):
-    ''' Problem with 2-D state space and circular obstacles. TODO: support obstacles with other shapes. '''
+    ''' Problem with 2-D state space and circular obstacles. TODO: support obstacles with other shapes.
+
+        Obstacles are indexed by a uniform grid, so collision checks only test the circles overlapping the cell of the query, and take O(1) time on average regardless of the number of obstacles.
+    '''
 
-    def __init__(self, x_min=0.0, x_max=1.0, y_min=0.0, y_max=1.0, init=(0.5, 0.5), goal=(1.0, 1.0), max_step=0.05, goal_tolerance=0.01, obstacles=None):
-        ''' Takes obstacles as a list of circles represented as ((x_center, y_center), radius). '''
+    def __init__(self, x_min=0.0, x_max=1.0, y_min=0.0, y_max=1.0, init=(0.5, 0.5), goal=(1.0, 1.0), max_step=0.05, goal_tolerance=0.01, obstacles=None, n_obstacles=10, max_radius=0.1):
+        ''' Takes obstacles as a list of circles represented as ((x_center, y_center), radius). If no obstacles are given, n_obstacles random circles of radius up to max_radius are generated. '''
 
         super(ObstacleProblem, self).__init__(x_min, x_max, y_min, y_max, init, goal, max_step, goal_tolerance)
 
         if obstacles:
-            self.obstacles = obstacles
+            self.set_obstacles(obstacles)
         else:
-            self.obstacles = self.generate_obstacles(10, 0.1)
+            self.set_obstacles(self.generate_obstacles(n_obstacles, max_radius))
 
     def generate_obstacles(self, n, max_radius):
-        ''' Returns a list of n randomly generated circles represented as ((x_center, y_center), radius). '''
+        ''' Returns a list of n randomly generated circles represented as ((x_center, y_center), radius). None of them contains the initial or goal state.
+
+            Circles are drawn in batches with NumPy, from a generator seeded by the random module, so that random.seed makes them reproducible.
+        '''
+        rng = numpy_random()
         obstacles = []
-        i = 0
-        while i < n:
-            (x, y) = self.random_state()
-            r = max_radius*(random.random()/2 + 0.5)
-            circle = ((x,y),r)
-            if not self.inside_circle(self.x_init, circle):
-                if not self.inside_circle(self.x_goal, circle):
-                    obstacles.append(circle)
-                    i += 1
+        while len(obstacles) < n:
+            m = n - len(obstacles)
+            x = rng.uniform(self.x_min, self.x_max, m)
+            y = rng.uniform(self.y_min, self.y_max, m)
+            r = max_radius*(rng.random_sample(m)/2 + 0.5)
+            keep = (((x - self.x_init[0])**2 + (y - self.x_init[1])**2 >= r**2)
+                    & ((x - self.x_goal[0])**2 + (y - self.x_goal[1])**2 >= r**2))
+            obstacles.extend(((x_, y_), r_) for x_, y_, r_ in zip(x[keep].tolist(), y[keep].tolist(), r[keep].tolist()))
         return obstacles
 
+    def set_obstacles(self, obstacles):
+        ''' Sets the list of obstacles and builds the grid index over them.
+
+            The cell size only depends on the density of the circles, so that cells hold about one circle center on average. Each circle is listed in every cell its bounding box overlaps, so a few large circles only add entries to the cells they cover, and do not make the cells of all the small ones larger.
+        '''
+        self.obstacles = obstacles
+        n = len(obstacles)
+        self.centers = np.array([o[0] for o in obstacles], dtype=float).reshape(n, 2)
+        self.radii = np.array([o[1] for o in obstacles], dtype=float)
+        self.radii2 = self.radii**2
+
+        width = self.x_max - self.x_min; height = self.y_max - self.y_min
+        self.cell = math.sqrt(width*height/max(n, 1))
+        self.nx = int(width//self.cell) + 1
+        self.ny = int(height//self.cell) + 1
+
+        # cells overlapped by the bounding box of each circle
+        origin = np.array([self.x_min, self.y_min])
+        lo = np.floor((self.centers - self.radii[:,None] - origin)/self.cell).astype(int)
+        hi = np.floor((self.centers + self.radii[:,None] - origin)/self.cell).astype(int)
+        lo = np.maximum(lo, 0); hi = np.minimum(hi, [self.nx-1, self.ny-1])
+        spans = np.maximum(hi - lo + 1, 0)
+        counts = spans[:,0]*spans[:,1]
+        ids = np.repeat(np.arange(n), counts)
+        k = np.arange(len(ids)) - np.repeat(np.cumsum(counts) - counts, counts) # position of each cell in the box of its circle
+        cells = (lo[ids,1] + k//spans[ids,0])*self.nx + lo[ids,0] + k%spans[ids,0]
+        order = np.lexsort((ids, cells))
+        cells = cells[order]; ids = ids[order]
+
+        # buckets of (x_center, y_center, radius**2) per cell for single queries, and a padded (cells, k) table of obstacle ids (-1 for unused slots) for batches
+        self.buckets = [[] for _ in xrange(self.nx*self.ny)]
+        centers = self.centers.tolist(); radii2 = self.radii2.tolist()
+        for c, i in zip(cells.tolist(), ids.tolist()):
+            self.buckets[c].append((centers[i][0], centers[i][1], radii2[i]))
+        counts = np.bincount(cells, minlength=self.nx*self.ny)
+        self.cell_table = np.full((self.nx*self.ny, max(counts.max(), 1)), -1, dtype=int)
+        slot = np.arange(len(cells)) - (np.cumsum(counts) - counts)[cells]
+        self.cell_table[cells, slot] = ids
+
     @staticmethod
     def inside_circle(point, circle):
         ''' Determines whether point is inside circle. '''
@@ -187,16 +471,48 @@ class ObstacleProblem(Basic2DProblem):
         return dist < circle[1]**2
 
     def collides(self, x):
-        ''' Determines whether state x is inside an obstacle region. '''
-        for o in self.obstacles:
-            if self.inside_circle(x, o):
+        ''' Determines whether state x is inside an obstacle region. x may also be an (n, 2) array of states, in which case a boolean array of length n is returned. '''
+        if np.ndim(x) == 2:
+            return self.collisions(np.asarray(x, dtype=float))
+
+        cx = min(max(int((x[0] - self.x_min)//self.cell), 0), self.nx-1)
+        cy = min(max(int((x[1] - self.y_min)//self.cell), 0), self.ny-1)
+        for (ox, oy, r2) in self.buckets[cy*self.nx + cx]:
+            if (x[0] - ox)**2 + (x[1] - oy)**2 < r2:
                 return True
         return False
 
+    def collisions(self, xs):
+        ''' Batched collides, testing each state of the (n, 2) array xs against the circles of its cell at once. '''
+        if not len(self.obstacles):
+            return np.zeros(len(xs), dtype=bool)
+        cx = np.clip(((xs[:,0] - self.x_min)//self.cell).astype(int), 0, self.nx-1)
+        cy = np.clip(((xs[:,1] - self.y_min)//self.cell).astype(int), 0, self.ny-1)
+        ids = self.cell_table[cy*self.nx + cx]
+        d2 = ((self.centers[ids] - xs[:,None,:])**2).sum(axis=2)
+        return ((d2 < self.radii2[ids]) & (ids >= 0)).any(axis=1)
+
     def valid_state(self, x):
         ''' Determines whether state x is within state space bounds and not within an obstacle region. '''
         return (super(ObstacleProblem, self).valid_state(x) and not self.collides(x))
 
+    def valid_edge(self, x1, x2):
+        ''' Determines whether the segment from x1 to x2 lies within bounds and does not enter any obstacle, i.e. passes no closer to the center of any circle than its radius. '''
+        if not (Basic2DProblem.valid_state(self, x1) and Basic2DProblem.valid_state(self, x2)):
+            return False
+        if not len(self.obstacles):
+            return True
+        a = np.array(x1[:2], dtype=float); d = np.array(x2[:2], dtype=float) - a
+        # closest point of the segment to each center
+        t = np.clip(np.dot(self.centers - a, d)/(np.dot(d, d) or 1.), 0, 1)
+        return not (((a + t[:,None]*d - self.centers)**2).sum(axis=1) < self.radii2).any()
+
+    def valid_states(self, xs):
+        ''' Batched valid_state: takes an (n, 2) array of states and returns a boolean array of length n. '''
+        xs = np.asarray(xs, dtype=float)
+        return ((self.x_min <= xs[:,0]) & (xs[:,0] <= self.x_max) & (self.y_min <= xs[:,1]) & (xs[:,1] <= self.y_max)
+                & ~self.collisions(xs))
+
     def setup_vis(self):
         return Visualizer(self.x_min, self.x_max, self.y_min, self.y_max, self.obstacles)
 
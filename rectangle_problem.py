@@ -2,35 +2,78 @@
 
 import rrt
 from PIL import Image
+from neighbors import SE2Index
 
 import math, random
-from problem import BitmapProblem
+import hashlib, os, time
+from functools import partial
+from runner import run_trials, print_stats
+from problem import Problem, BitmapProblem, numpy_random
 from vis import RectangeVisualizer
 import numpy as np
 
 class MovingRectangleProblem(BitmapProblem):
     ''' Problem with 2-D state space and no obstacles. '''
 
-    def __init__(self, image, rwidth, rheight, init, goal, max_step, max_rot, goal_tolerance=10):
+    def __init__(self, image, rwidth, rheight, init, goal, max_step, max_rot, goal_tolerance=10, clearance=False, angle_bins=None, cache_dir='.cspace_cache', free_sampling=False):
+        ''' If clearance is True, a distance transform of the map is used to accept poses far from obstacles, and reject poses whose inscribed circle overlaps one, without checking the collision grid (see BitmapProblem).
+
+            If angle_bins is set, the rotation is discretized into that many bins and a configuration space obstacle volume is built (see build_cspace), so that valid_state is a single array lookup. The volume is cached in cache_dir, unless cache_dir is None.
+
+            If free_sampling is True, random_state samples valid states only, see draw_free_states.
+        '''
         self.rwidth = rwidth
         self.rheight = rheight
+        self.inner_radius = min(rwidth, rheight)/2.0 # radius of the largest circle inside the rectangle
+        self.outer_radius = math.sqrt(rwidth**2 + rheight**2)/2.0 # radius of the smallest circle containing it
 
         self.max_rot = max_rot
 
         self.r_min = -math.pi; self.r_max = math.pi
 
-        super(MovingRectangleProblem, self).__init__(image, init, goal, max_step, goal_tolerance)
+        super(MovingRectangleProblem, self).__init__(image, init, goal, max_step, goal_tolerance, clearance=clearance, free_sampling=free_sampling)
 
         self.collision_grid = None
         self.__generate_collision_grid();
 
+        self.angle_bins = angle_bins
+        self.cspace = self.load_cspace(cache_dir) if angle_bins else None
+        self.free_cells = np.flatnonzero(~self.cspace) if free_sampling and self.cspace is not None else None # flat indices into cspace
+
     def random_state(self):
-        ''' Returns a state randomly selected within problem's 2D bounds. '''
+        ''' Returns a state randomly selected within problem's 2D bounds, or a random valid state if free_sampling is set. '''
+        if self.sampler is not None:
+            return self.sampler.sample()
         x = random.uniform(self.x_min, self.x_max)
         y = random.uniform(self.y_min, self.y_max)
         r = random.uniform(self.r_min, self.r_max)
         return (x, y, r)
 
+    def random_states(self, k):
+        if self.sampler is not None:
+            return self.sampler.samples(k)
+        rng = numpy_random()
+        return zip(rng.uniform(self.x_min, self.x_max, k).tolist(), rng.uniform(self.y_min, self.y_max, k).tolist(),
+                   rng.uniform(self.r_min, self.r_max, k).tolist())
+
+    def draw_free_states(self, rng, k):
+        ''' Returns k valid states drawn uniformly with the NumPy generator rng.
+
+            Candidates are drawn uniformly from the free cells of the configuration space volume if there is one, and otherwise from the poses whose centre lies in a free pixel. Candidates are then filtered with valid_states, and drawing is repeated until there are k of them.
+        '''
+        states = []
+        while len(states) < k:
+            n = 2*(k - len(states))
+            if self.free_cells is not None:
+                b, y, x = np.unravel_index(self.free_cells[rng.randint(len(self.free_cells), size=n)], self.cspace.shape)
+                r = self.r_min + (b + rng.random_sample(n))*2*math.pi/self.angle_bins
+            else:
+                y, x = np.divmod(self.free_pixels[rng.randint(len(self.free_pixels), size=n)], self.free.shape[1])
+                r = rng.uniform(self.r_min, self.r_max, n)
+            candidates = np.column_stack((x + rng.random_sample(n), y + rng.random_sample(n), r))
+            states.extend(map(tuple, candidates[self.valid_states(candidates)].tolist()))
+        return states[:k]
+
     #@classmethod
     def metric(cls, x1, x2):
         ''' Default metric for 2D problem: Euclidean distance '''
@@ -41,62 +84,160 @@ class MovingRectangleProblem(BitmapProblem):
 
         return (x2[0]-x1[0])**2+(x2[1]-x1[1])**2 + r**2
 
+    def metric_many(self, xs, x):
+        ''' Vectorized metric, using the same floating point operations. '''
+        xs = np.asarray(xs, dtype=float)
+        r = np.remainder(x[2] - xs[:,2] + math.pi, 2*math.pi) - math.pi
+        r = r*(self.x_max-self.x_min)/(2*math.pi)
+        return (x[0] - xs[:,0])**2 + (x[1] - xs[:,1])**2 + r**2
+
+    def metric_matrix(self, xs, ys):
+        ''' Vectorized metric between every pair, using the same floating point operations. '''
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float).reshape(-1, 3)
+        r = np.remainder(ys[:,2,None] - xs[:,2] + math.pi, 2*math.pi) - math.pi
+        r = r*(self.x_max-self.x_min)/(2*math.pi)
+        return (ys[:,0,None] - xs[:,0])**2 + (ys[:,1,None] - xs[:,1])**2 + r**2
 
     def valid_state(self, x):
         ''' Returns True if x is within problem's 2D bounds. '''
         within_bounds = (self.x_min <= x[0] <= self.x_max) and (self.y_min <= x[1] <= self.y_max) and (self.r_min <= x[2] <= self.r_max)
+        if self.cspace is not None:
+            return within_bounds and not self.cspace.item(self.angle_bin(x[2]), int(x[1]), int(x[0]))
         no_collision = within_bounds and not self.collides(x)
 
         return within_bounds and no_collision
 
+    def angle_bin(self, r):
+        ''' Returns the index of the rotation bin containing r. Bin k is centred on r_min + (k+0.5)*2*pi/angle_bins. '''
+        return int((r - self.r_min)*self.angle_bins/(2*math.pi)) % self.angle_bins
+
+    def footprint(self, k):
+        ''' Returns the footprint of bin k as a square boolean array of odd size, centred on the rectangle's centre and indexed [dy, dx].
+
+            The footprint contains every pixel offset at which an obstacle pixel can overlap the rectangle, for any rotation in the bin and any position of the centre within its pixel: the rectangle at the bin's centre angle, grown by sqrt(2) for the sub-pixel positions and by outer_radius*pi/angle_bins for the rotation within the bin.
+        '''
+        r = self.r_min + (k + 0.5)*2*math.pi/self.angle_bins
+        margin = math.sqrt(2) + self.outer_radius*math.pi/self.angle_bins
+        n = int(math.ceil(self.outer_radius + margin))
+        dy, dx = np.mgrid[-n:n+1, -n:n+1]
+
+        # offsets in the rectangle's frame, and their distance to the rectangle
+        u = np.abs(dx*math.cos(r) + dy*math.sin(r)) - self.rwidth/2.0
+        v = np.abs(-dx*math.sin(r) + dy*math.cos(r)) - self.rheight/2.0
+        return np.hypot(np.maximum(u, 0), np.maximum(v, 0)) <= margin
+
+    def build_cspace(self):
+        ''' Returns the configuration space obstacle volume, a boolean array indexed [angle bin, y, x] that is True where the rectangle overlaps an obstacle or leaves the map. Each bin is built by correlating the obstacle map, padded with obstacles, with the bin's footprint. Requires scipy. '''
+        from scipy.signal import fftconvolve
+
+        cspace = np.empty((self.angle_bins,) + self.free.shape, dtype=bool)
+        n = None
+        for k in xrange(self.angle_bins):
+            f = self.footprint(k)
+            if n != len(f)//2:
+                n = len(f)//2
+                # states beyond x_max or y_max are out of bounds, so the last column and row count as obstacles
+                padded = np.ones((self.free.shape[0]+2*n, self.free.shape[1]+2*n))
+                padded[n:-n-1,n:-n-1] = ~self.free[:-1,:-1]
+            cspace[k] = fftconvolve(padded, f[::-1,::-1].astype(float), mode='valid') > 0.5
+        return cspace
+
+    def load_cspace(self, cache_dir):
+        ''' Returns the configuration space obstacle volume, loading it from cache_dir if it was built before for the same map, rectangle size and number of bins, and storing it there otherwise. '''
+        if cache_dir is None:
+            return self.build_cspace()
+
+        key = hashlib.sha1(np.packbits(self.free).tostring())
+        key.update(repr((self.free.shape, self.rwidth, self.rheight, self.angle_bins)))
+        path = os.path.join(cache_dir, 'cspace_%s.npz' % key.hexdigest())
+        if os.path.exists(path):
+            with np.load(path) as f:
+                return np.unpackbits(f['cspace'])[:f['shape'].prod()].reshape(f['shape']).astype(bool)
+
+        cspace = self.build_cspace()
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        np.savez_compressed(path, cspace=np.packbits(cspace), shape=np.array(cspace.shape))
+        return cspace
+
     def pixel_collides(self, xy):
-        p = self.map.getpixel(xy)
-        if len(p) == 4:
-            return p[0:3] != (255,255,255) and p[3] != 0
-        else:
-            return p[0:3] != (255,255,255)
+        ''' Determines whether pixel xy is black. xy must be within bounds. '''
+        return not self.free.item(int(xy[1]), int(xy[0]))
 
     def __generate_collision_grid(self, sx=4, sy=8, vis=False):
-        # Generate a grid of points
-        def frange(start, step, n):
-            r = [0]*n
-            for i in range(0, n):
-                r[i] = start
-                start += step
-            return r
-
-        step_x = self.rwidth/(sx-1)
-        step_y = self.rheight/(sy-1)
-        x_coords = frange((-self.rwidth/2.0),step_x,sx)
-        y_coords = frange((-self.rheight/2.0),step_y,sy)
-        points = [(x, y) for x in x_coords for y in y_coords]
-        
-        self.collision_grid = tuple(points)
+        # Generate a grid of points, as an (sx*sy, 2) array of offsets from the rectangle's centre
+        x_coords = np.linspace(-self.rwidth/2.0, self.rwidth/2.0, sx)
+        y_coords = np.linspace(-self.rheight/2.0, self.rheight/2.0, sy)
+        points = np.array([(x, y) for x in x_coords for y in y_coords])
+
+        self.collision_grid = points
+        self.collision_grid_complex = points[:,0] + 1j*points[:,1] # rotating by r is multiplying by exp(i*r)
 
         if vis:
             import matplotlib.pyplot as plt
-            plt.plot([p[0] for p in points], [p[1] for p in points], '.')
+            plt.plot(points[:,0], points[:,1], '.')
             plt.xlim(-40, 40)
             plt.ylim(-40, 40)
             plt.gca().set_aspect('equal', adjustable='box')
             plt.show()
 
     def collides(self, state):
-        ''' Determines whether state x is in an obstacle region, indicated as black in bitmap. '''
-        xy = state[0:2]
-        r = state[2]
-
-        cosr = math.cos(r); sinr = math.sin(r)
-        for gp in self.collision_grid:
-            point = (gp[0]*cosr-gp[1]*sinr+xy[0], gp[0]*sinr+gp[1]*cosr+xy[1])
-            if point[0] > self.x_max or point[0] < self.x_min:
-                return True
-            if point[1] > self.y_max or point[1] < self.y_min:
-                return True
-            if self.pixel_collides(point):
+        ''' Determines whether state x is in an obstacle region, indicated as black in bitmap.
+
+            The collision grid is rotated and translated to the state, and collides if any of its points is out of bounds or in a black pixel. state may also be an (n, 3) array of states, in which case a boolean array of length n is returned.
+        '''
+        if np.ndim(state) == 1:
+            xy = state[0:2]
+            if self.clearance is not None and self.x_min <= xy[0] <= self.x_max and self.y_min <= xy[1] <= self.y_max:
+                c = self.clearance_at(xy)
+                if c - 2 > self.outer_radius:
+                    return False
+                if c < self.inner_radius:
+                    return True
+
+            cosr = math.cos(state[2]); sinr = math.sin(state[2])
+
+            # the extreme points of the grid are the rectangle's corners
+            dx = abs(self.rwidth*cosr)/2.0 + abs(self.rheight*sinr)/2.0
+            dy = abs(self.rwidth*sinr)/2.0 + abs(self.rheight*cosr)/2.0
+            if xy[0]-dx < self.x_min or xy[0]+dx > self.x_max or xy[1]-dy < self.y_min or xy[1]+dy > self.y_max:
                 return True
 
-        return False
+            p = self.collision_grid_complex*complex(cosr, sinr) + complex(xy[0], xy[1])
+            return not self.free[p.imag.astype(int), p.real.astype(int)].all()
+
+        # rotate the grid of every state at once: (n, 1) against (1, grid size)
+        states = np.asarray(state, dtype=float)
+        p = self.collision_grid_complex[None,:]*np.exp(1j*states[:,2,None]) + (states[:,0,None] + 1j*states[:,1,None])
+        px = p.real; py = p.imag
+
+        inside = (self.x_min <= px) & (px <= self.x_max) & (self.y_min <= py) & (py <= self.y_max)
+        ix = np.clip(px, self.x_min, self.x_max).astype(int)
+        iy = np.clip(py, self.y_min, self.y_max).astype(int)
+        return ~(inside & self.free[iy, ix]).all(axis=1)
+
+    def valid_states(self, xs):
+        ''' Batched valid_state: takes an (n, 3) array of states and returns a boolean array of length n. '''
+        xs = np.asarray(xs, dtype=float)
+        valid = ((self.x_min <= xs[:,0]) & (xs[:,0] <= self.x_max) & (self.y_min <= xs[:,1]) & (xs[:,1] <= self.y_max)
+                 & (self.r_min <= xs[:,2]) & (xs[:,2] <= self.r_max))
+        if self.cspace is not None:
+            bins = ((xs[valid,2] - self.r_min)*self.angle_bins/(2*math.pi)).astype(int) % self.angle_bins
+            valid[valid] = ~self.cspace[bins, xs[valid,1].astype(int), xs[valid,0].astype(int)]
+        else:
+            valid[valid] = ~self.collides(xs[valid])
+        return valid
+
+    def valid_edge(self, x1, x2, resolution=1.0):
+        ''' Determines whether the rectangle stays valid while moving from x1 to x2, translating along the straight line and turning the short way around, as new_state does. Poses are checked at intervals small enough that no point of the rectangle moves more than resolution pixels between them. '''
+        r = (x2[2]-x1[2] + math.pi) % (2*math.pi) - math.pi
+        dist = max(math.sqrt((x2[0]-x1[0])**2 + (x2[1]-x1[1])**2) + self.outer_radius*abs(r), 1e-9)
+        t = np.linspace(0, 1, int(math.ceil(dist/resolution)) + 1)
+        poses = np.column_stack((x1[0] + t*(x2[0]-x1[0]), x1[1] + t*(x2[1]-x1[1]), x1[2] + t*r))
+        poses[:,2] = (poses[:,2] - self.r_min) % (2*math.pi) + self.r_min # wrap into [r_min, r_max)
+        poses[-1] = x2
+        return bool(self.valid_states(poses).all())
 
     def new_state(self, x1, x2, reverse=False, try_no_rotation=False):
         ''' Takes a step from x1 toward x2.
@@ -146,6 +287,10 @@ class MovingRectangleProblem(BitmapProblem):
 
         return x, u
 
+    def new_states(self, x1s, x2s, reverse=False):
+        ''' Batched new_state. new_state retries a failed step without rotation, so steps are taken one at a time; only nearest-neighbor search is batched for this problem. '''
+        return Problem.new_states(self, x1s, x2s, reverse)
+
     def goal_reached(self, x):
         ''' Determines whether x is within the goal region. '''
         return (x[0]-self.x_goal[0])**2 + (x[1]-self.x_goal[1])**2 + (x[2]-self.x_goal[2])**2 <= self.goal_tol**2
@@ -154,35 +299,17 @@ class MovingRectangleProblem(BitmapProblem):
         return RectangeVisualizer(self.x_min, self.x_max, self.y_min, self.y_max, self.rwidth, self.rheight, self.map)
 
 
-if __name__ == '__main__':
-    # Problem
-    problem = MovingRectangleProblem(Image.open("./benchmarks/worms_500x500_init60x440_goal440x60.png"), 20, 40, (60, 440, 0), (440,60, 0), 20, max_rot=math.pi/18)    
-    
-    # Solve
-    #solver = rrt.RRT(problem)
-    solver = rrt.BIRRT(problem)
-    #final_state,tree1,tree2 = solver.build_rrt(problem.x_init, problem.x_goal, 1000, show_vis=True, print_debug=True)
-
-    counts = []
-    extensions = []
-    t1count = []
-    t2count = []
-    for i in xrange(0, 500):
-        #final_state,tree1 = solver.build_rrt(problem.x_init, problem.x_goal, 50000, goal_bias=0.05, show_vis=False); tree2 = None # For normal RRT
-        final_state,tree1,tree2 = solver.build_rrt(problem.x_init, problem.x_goal, 50000, show_vis=False) # For BIRRT
-        
-        counts.append(solver._iterations_executed)
-        t1count.append(len(tree1.nodes))
-        if tree2:
-            t2count.append(len(tree2.nodes))
-
-    print "counts", counts
-    print "t1count", t1count
-    if t2count:
-        print "t2count", t2count
+def make_problem():
+    return MovingRectangleProblem(Image.open("./benchmarks/worms_500x500_init60x440_goal440x60.png"), 20, 40, (60, 440, 0), (440,60, 0), 20, max_rot=math.pi/18)
 
 
-    print "iterations:\t", np.mean(counts), np.std(counts)
-    print "t1 extensions\t", np.mean(t1count), np.std(t1count)
-    if t2count:
-        print "t2 extensions\t", np.mean(t2count), np.std(t2count)
\ No newline at end of file
+if __name__ == '__main__':
+    # Solve, with trials spread over all CPUs (see module runner)
+    #make_solver = partial(rrt.RRT, index=SE2Index)
+    make_solver = partial(rrt.BIRRT, index=SE2Index)
+    #problem = make_problem(); final_state,tree1,tree2 = make_solver(problem).build_rrt(problem.x_init, problem.x_goal, 1000, show_vis=True, print_debug=True)
+
+    start = time.time()
+    #results = run_trials(make_problem, make_solver, 500, 50000, goal_bias=0.05) # For normal RRT
+    results = run_trials(make_problem, make_solver, 500, 50000) # For BIRRT
+    print_stats(results, time.time() - start)
@@ -1,35 +1,120 @@
 from sys import maxint
 from random import uniform
-from vis import Visualizer
+from time import time
+from math import log, sqrt, pi
+from neighbors import KDTreeIndex, SE2Index
+from vis import Visualizer, LiveView
+import numpy as np
 
 ''' Module rrt provides a framework for RRT path planners. To use an RRT, initialize it with a Problem instance, and then call build_rrt(...). 
 '''
 
 
 class RRTBase(object):
-    ''' Abstract base class for RRT solvers. Provides standard implementations of extend(), nearest_neighbor(), and visualize(). Derived classes must implement method build_rrt(). '''
+    ''' Abstract base class for RRT solvers. Provides standard implementations of extend(), nearest_neighbor(), and visualize(). Derived classes must implement method search(), which build_rrt() and iter_rrt() run. '''
 
-    def __init__(self, problem):
-        ''' Initializes RRT with a Problem object. '''
+    check_every = 16 # iterations between checks of time_limit and should_stop, see Budget
+
+    def __init__(self, problem, index=None, tree_class=None, profile=False):
+        ''' Initializes RRT with a Problem object.
+
+            Optionally takes a NeighborIndex class (see module neighbors), used to index the states of every tree built by the solver. By default, nearest neighbors are found by a linear scan over the tree.
+
+            tree_class selects the tree implementation (Tree or ArrayTree); it defaults to Tree.
+
+            If profile is True, every call to build_rrt collects a PlannerStats object, available as self.stats once it returns. Otherwise self.stats is None, and nothing is instrumented.
+        '''
         self.P = problem
+        self.index = index
+        self.tree_class = tree_class or Tree
 
         self._iterations_executed = 0
+        self._final_nodes = {} # tree -> node of final state, from the last call to build_rrt
+        self.stopped = None # 'time_limit' or 'cancelled' if the last search was stopped early, see Budget
+        self._live_view = None # LiveView of build_rrt with live_vis, while it runs
+
+        self.stats = None
+        if profile:
+            self.build_rrt = self.profiled(self.build_rrt)
 
-    def build_rrt(self, x_init, x_goal, max_iter, goal_bias, show_vis=False):
-        ''' Abstract method. Builds RRT, given start state, goal state, and algorithm parameters.
+    def profiled(self, build_rrt):
+        ''' Returns build_rrt wrapped so that each call collects a new PlannerStats into self.stats. '''
+        def wrapper(*args, **kwargs):
+            self.stats = stats = PlannerStats()
+            installed = stats.instrument(self) + stats.instrument(self.P)
+            start = time()
+            try:
+                return build_rrt(*args, **kwargs)
+            finally:
+                stats.total_time += time() - start
+                stats.iterations = self._iterations_executed
+                for obj, name, previous in reversed(installed):
+                    if previous is None:
+                        delattr(obj, name)
+                    else:
+                        setattr(obj, name, previous)
+        return wrapper
 
-            Parameters:
+    def build_rrt(self, *args, **kwargs):
+        ''' Builds the trees and returns the solution, given start state, goal state, and algorithm parameters. Takes the arguments of search in the derived class, and runs it to completion.
+
+            Parameters taken by every solver:
             - max_iter: maximum number of iterations before terminating.
-            - goal_bias: probability of using goal state as random state in any given iteration.
-            - show_vis: boolean flag whether or not to show visualization.
+            - time_limit: if set, stop after this many seconds.
+            - should_stop: function without arguments, e.g. the is_set method of a threading.Event; the search stops as soon as it returns True.
+            - live_vis: if set, draw the trees as they grow, every live_vis iterations (see LiveView). The figure is closed when the search ends; use show_vis to keep a picture of the final trees.
+
+            The time limit and should_stop are checked every self.check_every iterations. self.stopped tells whether the last search was stopped by them.
+        '''
+        live_vis = kwargs.pop('live_vis', None)
+        if live_vis:
+            kwargs['every'] = live_vis
+        try:
+            for progress in self.search(*args, **kwargs):
+                if live_vis and not progress.done:
+                    if self._live_view is None:
+                        self._live_view = LiveView(self.P.setup_vis(), ('r', 'b')[:len(progress.trees)])
+                    view = self._live_view
+                    view.update([tree.segments(n + 1) for tree, n in zip(progress.trees, view.counts)])
+        finally:
+            self.close_live_view()
+        return progress.result
+
+    def close_live_view(self):
+        ''' Closes the figure of the live visualization of build_rrt, if one is open, so that the next figure starts afresh. '''
+        if self._live_view is not None:
+            self._live_view.close()
+            self._live_view = None
+
+    def iter_rrt(self, *args, **kwargs):
+        ''' Generator version of build_rrt: takes the same arguments except live_vis, plus every (100 by default), and yields a Progress snapshot every `every` iterations. The last snapshot yielded has done set, and holds the value build_rrt would return as result.
+
+            To draw the trees as they grow, pass the segments of each snapshot's trees to a LiveView, as build_rrt does.
         '''
+        if 'live_vis' in kwargs:
+            raise TypeError("iter_rrt() does not take live_vis; draw progress.trees with a LiveView, or call build_rrt")
+        kwargs.setdefault('every', 100)
+        return self.search(*args, **kwargs)
+
+    def search(self, x_init, x_goal, max_iter, time_limit=None, should_stop=None, every=None):
+        ''' Abstract method. Generator that builds the trees, yielding a Progress snapshot every `every` iterations (never if every is None), and a last one holding the result. '''
         raise NotImplementedError("Should have implemented this")
 
+    def new_tree(self, x):
+        ''' Returns a new Tree with root state x, indexed with the solver's neighbor index if one was given. '''
+        if self.index is None:
+            return self.tree_class(x)
+        return self.tree_class(x, self.index(self.P))
+
+    def load_tree(self, path):
+        ''' Returns the tree saved by Tree.save in file path, as an instance of the solver's tree class, indexed with the solver's neighbor index if one was given. '''
+        return self.tree_class.load(path, self.index(self.P) if self.index is not None else None)
+
     def extend(self, tree, x, reverse=False):
         ''' Extends tree in direction of state x:
             1. Finds tree's nearest neighbor to x.
             2. Finds an intermediate state that extends tree toward x.
-            3. Adds new node and edge to tree and returns the new state.
+            3. Adds new node and edge to tree and returns the new node.
                If reverse=False, the edge (input) goes from the nearest neighbor to the new node.
                If reverse=True, the edge (input) goes from the new node to the nearest neighbor.
                If a new state was not found, returns None.
@@ -39,13 +124,15 @@ class RRTBase(object):
         (x_new, u_new) = self.P.new_state(nearest_node.data, x, reverse=reverse)
 
         if x_new:
-            tree.add_node(x_new, nearest_node, u_new)
-            return x_new
+            return tree.add_node(x_new, nearest_node, u_new)
 
         return None
 
     def nearest_neighbor(self, tree, x):
         ''' Returns node in tree with minimum distance to x, as defined by the P.metric function. '''
+        if tree.index is not None:
+            return tree.nodes[tree.index.nearest(x)]
+
         min_dist = maxint
         nearest_node = None
         for node in tree.nodes:
@@ -55,82 +142,150 @@ class RRTBase(object):
                 nearest_node = node
         return nearest_node
 
+    def extend_many(self, tree, xs, reverse=False):
+        ''' Batched extend: extends tree toward every state in xs, and returns the list of new nodes (None where no new state was found).
+
+            Nearest neighbors are all found in the tree as it was before the call, so a new node is never the nearest neighbor of a later state in the same batch.
+        '''
+        nearest_nodes = self.nearest_neighbors(tree, xs)
+        x_news, u_news = self.P.new_states([node.data for node in nearest_nodes], xs, reverse=reverse)
+        return [tree.add_node(x_new, node, u_new) if x_new else None
+                for node, x_new, u_new in zip(nearest_nodes, x_news, u_news)]
+
+    def nearest_neighbors(self, tree, xs):
+        ''' Returns the list of nodes nearest_neighbor(tree, x) for each x in xs. Without a neighbor index, the distances from every state in xs to every node are computed with one P.metric_matrix call. '''
+        if tree.index is not None:
+            return [tree.nodes[i] for i in tree.index.nearest_many(xs)]
+        nearest = self.P.metric_matrix(tree.state_array(), xs).argmin(axis=1) # argmin returns the first minimum, matching the linear scan
+        return [tree.nodes[i] for i in nearest.tolist()]
+
+    def get_path(self, tree, final_state):
+        ''' Returns tree.get_path(final_state), starting from the node recorded by the last call to build_rrt if it represents final_state, so that no lookup is needed. '''
+        node = self._final_nodes.get(tree)
+        if node is not None and node.data == final_state:
+            return tree.get_path(node)
+        return tree.get_path(final_state)
+
     def visualize(self, tree, final_state=None, x_goal=None, color='r', show=True):
-        ''' Creates and displays visualization for a (solved) RRT. '''
+        ''' Creates and displays visualization for a (solved) RRT.
+
+            show is True to display the figure, a file name (e.g. 'tree.png' or 'tree.svg') to save it to instead, which works without a display, or False to leave it open for more drawing.
+        '''
+        self.close_live_view()
         v = self.P.setup_vis()
-        for n in tree.nodes:
-            if n.parent:
-                v.draw_edge(n.parent.data, n.data, color=color)
+        states, parents, edges = tree.arrays()
+        v.draw_tree(states, parents, color=color)
         if final_state:
-            v.draw_solution(tree.get_path(final_state)[0], color=color)
+            v.draw_solution(self.get_path(tree, final_state)[0], color=color)
         v.draw_initial(tree.root.data)
         if x_goal:
             v.draw_goal(x_goal)
-        if show:
+        if show is True:
             v.done()
+        elif show:
+            v.save(show)
 
 
 class RRT(RRTBase):
     ''' Basic RRT implementation. '''
 
-    def build_rrt(self, x_init, x_goal, max_iter=100, goal_bias=0, show_vis=False, print_debug=False):
-        ''' Builds RRT, given start state, goal state, and other algorithm parameters.
+    def search(self, x_init, x_goal, max_iter=100, goal_bias=0, show_vis=False, print_debug=False, batch_size=1, time_limit=None, should_stop=None, every=None, tree=None):
+        ''' Builds RRT, given start state, goal state, and other algorithm parameters. Called by build_rrt and iter_rrt.
 
             Input arguments:
             - x_init: start state
             - x_goal: goal state
             - max_iter: maximum number of iterations before terminating
             - goal_bias: probability of sampling x_goal
-            - vis_steps: visualize each step as new nodes are added
+            - show_vis: if True, show a visualization of the trees at the end; if a file name, save it to that file instead (see visualize)
+            - batch_size: number of random states drawn and extended toward per step (see extend_many). Each state counts as one iteration.
+            - time_limit, should_stop: see build_rrt
+            - every: yield a Progress snapshot every this many iterations (see iter_rrt)
+            - tree: existing tree rooted at x_init, e.g. from an earlier call or loaded with load_tree, to continue growing instead of starting from x_init alone. If a node of the tree nearest to x_goal already reaches the goal, it is returned without any iteration.
             
             Returns:
             - State x such that goal_reached(x) is true.
             - None if goal state is not reached before max number of iterations.
         '''
+        budget = Budget(time_limit, should_stop, every, self.check_every)
         self._iterations_executed = 0 
+        self._final_nodes = {}
+        self.stopped = None
 
-        tree = Tree(x_init)
+        if tree is None:
+            tree = self.new_tree(x_init)
+            node = tree.root
+        else:
+            assert tree.root.data == x_init, 'tree should be rooted at x_init'
+            node = self.nearest_neighbor(tree, x_goal)
 
-        if self.P.goal_reached(x_init):
-            return x_init, tree
+        if self.P.goal_reached(node.data):
+            self._final_nodes = {tree: node}
+            yield budget.progress(0, (tree,), node.data, result=(node.data, tree))
+            return
 
         counter = 0
+        check = budget.next_check(counter)
         while counter < max_iter:
-            counter += 1
-            self._iterations_executed += 1
+            if counter >= check:
+                if budget.expired():
+                    break
+                if budget.report_due(counter):
+                    yield budget.progress(counter, (tree,))
+                check = budget.next_check(counter)
 
-            # select a random state with probability = 1-goal_bias,
-            # or the goal state with probability = goal_bias
-            if uniform(0,1) >= goal_bias:
-                x_rand = self.P.random_state()
+            if batch_size > 1:
+                k = min(batch_size, max_iter - counter)
+                counter += k
+                self._iterations_executed += k
+
+                # as below, each state is the goal state with probability = goal_bias
+                x_rands = [x_goal if uniform(0,1) < goal_bias else x for x in self.P.random_states(k)]
+                nodes = self.extend_many(tree, x_rands)
+                node = next((node for node in nodes if node and self.P.goal_reached(node.data)), None)
             else:
-                x_rand = x_goal
+                counter += 1
+                self._iterations_executed += 1
 
-            # extend the tree in the direction of x_rand
-            x_new = self.extend(tree, x_rand)
+                # select a random state with probability = 1-goal_bias,
+                # or the goal state with probability = goal_bias
+                if uniform(0,1) >= goal_bias:
+                    x_rand = self.P.random_state()
+                else:
+                    x_rand = x_goal
 
-            if x_new and self.P.goal_reached(x_new):
+                # extend the tree in the direction of x_rand
+                node = self.extend(tree, x_rand)
+
+            if node and self.P.goal_reached(node.data):
+                x_new = node.data
+                self._final_nodes = {tree: node}
                 if print_debug:
                     print('Reached goal in %d iterations' % counter)
                     print('Final state: %s' % (x_new,))
                 
                 if show_vis:
-                    self.visualize(tree, x_new, x_goal=x_goal)
+                    self.visualize(tree, x_new, x_goal=x_goal, show=show_vis)
 
-                return x_new, tree
+                yield budget.progress(counter, (tree,), x_new, result=(x_new, tree))
+                return
 
         # goal not reached
+        self.stopped = budget.stopped
         if print_debug:
-            print('Reached max number of iterations (%d)' % max_iter)
+            if self.stopped:
+                print('Stopped (%s) after %d iterations' % (self.stopped, counter))
+            else:
+                print('Reached max number of iterations (%d)' % max_iter)
 
         if show_vis:
-            self.visualize(tree, x_goal=x_goal)
+            self.visualize(tree, x_goal=x_goal, show=show_vis)
 
-        return None, tree
+        yield budget.progress(counter, (tree,), result=(None, tree))
 
     def get_solution_from_tree(self, final_state, tree):
         if final_state is not None:
-            return tree.get_path(final_state)
+            return self.get_path(tree, final_state)
         else:
             return None, None
 
@@ -138,73 +293,486 @@ class RRT(RRTBase):
 class BIRRT(RRTBase):
     ''' Bidirectional RRT solver. '''
 
-    def build_rrt(self, x_init, x_goal, max_iter, show_vis=False, print_debug=False):
-        ''' Builds bidirectional RRT, given start state, goal state, and max number of iterations.
+    def search(self, x_init, x_goal, max_iter, show_vis=False, print_debug=False, batch_size=1, connect=False, join_tolerance=0, time_limit=None, should_stop=None, every=None, tree=None):
+        ''' Builds bidirectional RRT, given start state, goal state, and max number of iterations. Called by build_rrt and iter_rrt.
 
             Input arguments:
             - x_init: start state
             - x_goal: goal state
             - max_iter: maximum number of iterations before terminating
-            - show_vis: boolean flag whether or not to show visualization
+            - show_vis: if True, show a visualization of the trees at the end; if a file name, save it to that file instead (see visualize)
+            - batch_size: number of random states drawn per step. Tree 1 is extended toward all of them with extend_many, then tree 2 toward all the new states of tree 1. Each state counts as one iteration.
+            - connect: if True, tree 2 keeps stepping toward each new state of tree 1 until it reaches it or is blocked (see connect), as in RRT-Connect, instead of taking a single step. If 'both', tree 1 also keeps stepping toward each random state (except in batched steps, where tree 1 is extended with extend_many).
+            - join_tolerance: the trees are also joined when a node of tree 2 is within this distance of the new state of tree 1 (the square root of P.metric, as for RRTStar and PRM radii), and a single step of P.new_state leads from the init tree's node to the goal tree's node.
+            - time_limit, should_stop: see build_rrt
+            - every: yield a Progress snapshot every this many iterations (see iter_rrt)
+            - tree: existing init tree rooted at x_init, e.g. from an earlier call or loaded with load_tree, to continue growing instead of starting from x_init alone. The goal tree always starts from x_goal.
             
             Returns:
-            - State x such that goal_reached(x) is true.
+            - State x such that goal_reached(x) is true. This is the state of the init tree's node at which the trees were joined.
             - None if goal state is not reached before max number of iterations.
         '''
-        t_init = Tree(x_init)
-        t_goal = Tree(x_goal)
+        budget = Budget(time_limit, should_stop, every, self.check_every)
+        if tree is None:
+            t_init = self.new_tree(x_init)
+        else:
+            assert tree.root.data == x_init, 'tree should be rooted at x_init'
+            t_init = tree
+        t_goal = self.new_tree(x_goal)
 
         self._iterations_executed = 0 
+        self._final_nodes = {}
+        self.stopped = None
 
         counter = 0
+        check = budget.next_check(counter)
         t1 = t_init
         t2 = t_goal
         reverse=False
         while counter < max_iter:
-            counter += 1
-            self._iterations_executed += 1
+            if counter >= check:
+                if budget.expired():
+                    break
+                if budget.report_due(counter):
+                    yield budget.progress(counter, (t_init, t_goal))
+                check = budget.next_check(counter)
 
-            x_rand = self.P.random_state()
-            
-            # extends tree 1 toward random state
-            x_new1 = self.extend(t1, x_rand, reverse)
-            if x_new1 is not None:
-                # extends tree 2 toward new state just added to tree 1
-                x_new2 = self.extend(t2, x_new1, not reverse)
-
-                if x_new1 == x_new2:
-                    if print_debug:
-                        print('Reached goal in %d iterations' % counter)
-                    if show_vis:
-                        self.visualize(t1, t2, x_new1)
-                    return x_new1, t_init, t_goal
+            joined = None
+            if batch_size > 1:
+                k = min(batch_size, max_iter - counter)
+                counter += k
+                self._iterations_executed += k
+
+                nodes1 = [node for node in self.extend_many(t1, self.P.random_states(k), reverse) if node is not None]
+                if connect:
+                    for node1 in nodes1:
+                        node2 = self.connect(t2, node1.data, not reverse, join_tolerance)
+                        if node2 is not None and self.joined(node1, node2, reverse, join_tolerance):
+                            joined = node1, node2
+                            break
+                elif nodes1:
+                    nodes2 = self.extend_many(t2, [node.data for node in nodes1], not reverse)
+                    joined = next(((node1, node2) for node1, node2 in zip(nodes1, nodes2)
+                                   if node2 is not None and self.joined(node1, node2, reverse, join_tolerance)), None)
+            else:
+                counter += 1
+                self._iterations_executed += 1
+
+                x_rand = self.P.random_state()
+
+                # extends tree 1 toward random state
+                if connect == 'both':
+                    node1 = self.connect(t1, x_rand, reverse)
+                else:
+                    node1 = self.extend(t1, x_rand, reverse)
+                if node1 is not None:
+                    # extends tree 2 toward new state just added to tree 1
+                    if connect:
+                        node2 = self.connect(t2, node1.data, not reverse, join_tolerance)
+                    else:
+                        node2 = self.extend(t2, node1.data, not reverse)
+                    if node2 is not None and self.joined(node1, node2, reverse, join_tolerance):
+                        joined = node1, node2
+
+            if joined is not None:
+                node1, node2 = joined
+                self._final_nodes = {t1: node1, t2: node2}
+                x_new1 = self._final_nodes[t_init].data
+                if print_debug:
+                    print('Reached goal in %d iterations' % counter)
+                if show_vis:
+                    self.visualize(t1, t2, x_new1, show=show_vis)
+                yield budget.progress(counter, (t_init, t_goal), x_new1, result=(x_new1, t_init, t_goal))
+                return
 
             t1, t2 = t2, t1
             reverse = not reverse
             
 
-        # max iterations reached before trees connected
+        # max iterations reached (or search stopped) before trees connected
+        self.stopped = budget.stopped
         if print_debug:
-            print('Reached max number of iterations (%d)' % max_iter)
+            if self.stopped:
+                print('Stopped (%s) after %d iterations' % (self.stopped, counter))
+            else:
+                print('Reached max number of iterations (%d)' % max_iter)
         if show_vis:
-            self.visualize(t1, t2)
+            self.visualize(t1, t2, show=show_vis)
 
-        return None, t_init, t_goal
+        yield budget.progress(counter, (t_init, t_goal), result=(None, t_init, t_goal))
 
-    def visualize(self, tree1, tree2, final_state=None):
-        super(BIRRT, self).visualize(tree1, final_state, show=False)
-        super(BIRRT, self).visualize(tree2, final_state, color='b')
+    def connect(self, tree, x, reverse=False, join_tolerance=0):
+        ''' Extends tree toward state x, then keeps stepping from each new node toward x until x is reached (or is within join_tolerance), the step is blocked, or it makes no progress. Returns the last new node, or None if the first extension failed. '''
+        node = self.extend(tree, x, reverse)
+        while node is not None and node.data != x and not (join_tolerance and self.P.metric(node.data, x) <= join_tolerance**2):
+            next_node = self.step(tree, node, x, reverse)
+            if next_node is None:
+                break
+            node = next_node
+        return node
+
+    def step(self, tree, node, x, reverse=False):
+        ''' Adds a node one step from node toward x, without a nearest-neighbor search. Returns the new node, or None if the step is blocked or leaves the state unchanged. '''
+        x_new, u_new = self.P.new_state(node.data, x, reverse=reverse)
+        if x_new and x_new != node.data:
+            return tree.add_node(x_new, node, u_new)
+        return None
+
+    def joined(self, node1, node2, reverse, join_tolerance):
+        ''' Returns True if node1 of tree 1 and node2 of tree 2 join the trees: they have the same state, or are within distance join_tolerance and one step of P.new_state leads exactly from the node of the init tree (tree 1 unless reverse) to the other. '''
+        if node1.data == node2.data:
+            return True
+        if not join_tolerance or self.P.metric(node1.data, node2.data) > join_tolerance**2:
+            return False
+        a, b = (node2.data, node1.data) if reverse else (node1.data, node2.data)
+        return self.P.new_state(a, b)[0] == b
+
+    def visualize(self, tree1, tree2, final_state=None, show=True):
+        nodes = self._final_nodes if final_state is not None else {} # the trees may have been joined at different nodes
+        super(BIRRT, self).visualize(tree1, nodes.get(tree1, final_state), show=False)
+        super(BIRRT, self).visualize(tree2, nodes.get(tree2, final_state), color='b', show=show)
 
     def get_solution_from_tree(self, final_state, init_tree, goal_tree):
         if final_state is not None:
-            states1,inputs1 = init_tree.get_path(final_state)
-            states2,inputs2 = init_tree.get_path(final_state)
+            states1,inputs1 = self.get_path(init_tree, final_state)
+            goal_node = self._final_nodes.get(goal_tree)
+            if goal_node is not None and goal_node.data != final_state:
+                # trees joined within join_tolerance: add the step between the two nodes
+                states2,inputs2 = goal_tree.get_path(goal_node)
+                states2.reverse(); inputs2.reverse()
+                return states1+states2, inputs1+[self.P.new_state(final_state, goal_node.data)[1]]+inputs2
+            states2,inputs2 = self.get_path(goal_tree, final_state)
             states2.reverse(); inputs2.reverse()
             return states1+states2[1:], inputs1+inputs2
         else:
             return None, None
     
 
+class RRTStar(RRT):
+    ''' Anytime RRT* solver (Karaman and Frazzoli, 2011). Each new node is connected to the neighbor within a shrinking radius that gives it the lowest cost-to-come, and neighbors that can be reached more cheaply through the new node are rewired to it, so paths converge toward optimal ones as the tree grows.
+
+        The cost of an edge is its length, sqrt(P.metric). An edge between two nodes is feasible if a single call to P.new_state leads exactly from one to the other.
+
+        The clock is read before every iteration, which costs little next to the neighbor queries. That time is checked against the time limit and stamped on any solution the iteration finds, so that solutions are never reported past it.
+
+        Radius queries need an index supporting near (see module neighbors) that matches the problem's metric. The index defaults to SE2Index for states (x, y, r), matching the metric of MovingRectangleProblem, and to KDTreeIndex otherwise, matching the metric of Basic2DProblem and its subclasses. Other problems must pass a suitable index, e.g. BruteForceIndex.
+    '''
+
+    check_every = 1
+
+    def __init__(self, problem, index=None, tree_class=None, profile=False, gamma=None):
+        ''' gamma scales the rewiring radius min(gamma*(log n/n)**(1/d), P.max_step); it defaults to the value that guarantees asymptotic optimality, computed from the bounds of the state space (see default_gamma). '''
+        if index is None:
+            index = SE2Index if len(problem.x_init) == 3 else KDTreeIndex
+        super(RRTStar, self).__init__(problem, index, tree_class, profile)
+        self.gamma = gamma or self.default_gamma()
+        self.costs = [] # cost-to-come of each node of the last tree built, by position
+        self.solutions = [] # (seconds, iterations, cost) each time the best solution improved during the last call to build_rrt, timed from the start of the iteration that found it
+        self._best = None # position of the node of the best solution
+
+    def default_gamma(self):
+        ''' Returns (2*(1+1/d))**(1/d)*(volume/unit ball volume)**(1/d), the smallest gamma for which RRT* is asymptotically optimal, with the free space volume bounded by the volume of the state space. A third coordinate is taken to span the width of the map, as the rotation does in the metric of MovingRectangleProblem. '''
+        d = len(self.P.x_init)
+        width = self.P.x_max - self.P.x_min
+        volume = width*(self.P.y_max - self.P.y_min)*(width if d == 3 else 1)
+        unit_ball = pi if d == 2 else 4*pi/3
+        return (2*(1 + 1./d))**(1./d)*(volume/unit_ball)**(1./d)
+
+    def nearest_position(self, tree, x):
+        ''' Returns the position of the node of tree nearest to x. '''
+        return tree.index.nearest(x)
+
+    def near_neighbors(self, tree, x, radius):
+        ''' Returns the positions of the nodes of tree within distance radius of x. '''
+        return tree.index.near(x, radius)
+
+    def search(self, x_init, x_goal, max_iter=10000, goal_bias=0, time_limit=None, first_solution=False, show_vis=False, print_debug=False, should_stop=None, every=None):
+        ''' Builds an RRT* tree, given start state, goal state, and other algorithm parameters. Called by build_rrt and iter_rrt.
+
+            Input arguments:
+            - x_init: start state
+            - x_goal: goal state
+            - max_iter: maximum number of iterations before terminating
+            - goal_bias: probability of sampling x_goal
+            - time_limit: if set, the search also stops after this many seconds. Until then, the tree keeps growing and improving the best solution found (anytime mode); see self.solutions.
+            - first_solution: if True, stop as soon as the goal is reached, like RRT.
+            - should_stop: see build_rrt
+            - every: yield a Progress snapshot, with the best solution so far, every this many iterations (see iter_rrt)
+
+            Returns:
+            - State x such that goal_reached(x) is true, with the lowest cost-to-come found.
+            - None if goal state is not reached before max number of iterations.
+        '''
+        budget = Budget(time_limit, should_stop, every, self.check_every)
+        self._iterations_executed = 0
+        self._final_nodes = {}
+        self.stopped = None
+        self.solutions = []
+
+        tree = self.new_tree(x_init)
+        self.costs = costs = [0.]
+        parents = [-1] # position of the parent of each node
+        children = [[]] # positions of the children of each node
+        is_goal = [self.P.goal_reached(x_init)] # whether each node reaches the goal
+        best = 0 if is_goal[0] else None # position of the goal node with the lowest cost
+        best_cost = 0. if is_goal[0] else float('inf')
+        d = len(x_init)
+
+        check = budget.next_check(0)
+        while self._iterations_executed < max_iter and not (first_solution and best is not None):
+            started = time() # solutions are stamped with the start of the iteration that found them, which is before the deadline
+            if self._iterations_executed >= check:
+                if budget.report_due(self._iterations_executed):
+                    if best is None:
+                        yield budget.progress(self._iterations_executed, (tree,))
+                    else:
+                        yield budget.progress(self._iterations_executed, (tree,), tree.nodes[best].data, best_cost)
+                    started = time()
+                if budget.expired(started):
+                    break
+                check = budget.next_check(self._iterations_executed)
+
+            self._iterations_executed += 1
+
+            if uniform(0,1) >= goal_bias:
+                x_rand = self.P.random_state()
+            else:
+                x_rand = x_goal
+
+            nearest = self.nearest_position(tree, x_rand)
+            x_new, u_new = self.P.new_state(tree.nodes[nearest].data, x_rand)
+            if not x_new:
+                continue
+
+            n = len(tree.nodes)
+            radius = min(self.gamma*(log(n)/n)**(1./d), self.P.max_step) if n > 1 else self.P.max_step
+            near = self.near_neighbors(tree, x_new, radius)
+            if nearest not in near:
+                near.append(nearest)
+            dists = [sqrt(self.P.metric(tree.nodes[j].data, x_new)) for j in near]
+
+            # choose parent: the feasible neighbor giving the lowest cost-to-come, trying the cheapest first
+            for c, j in sorted((costs[j] + dist, j) for j, dist in zip(near, dists)):
+                if j == nearest:
+                    break
+                x, u = self.P.new_state(tree.nodes[j].data, x_new)
+                if x == x_new:
+                    u_new = u
+                    break
+            parent = j
+            i = n
+            tree.add_node(x_new, tree.nodes[parent], u_new)
+            costs.append(c)
+            parents.append(parent)
+            children.append([])
+            children[parent].append(i)
+            is_goal.append(self.P.goal_reached(x_new))
+            improved = is_goal[i] and c < best_cost
+            if improved:
+                best = i; best_cost = c
+
+            # rewire: route neighbors through the new node where that is cheaper
+            for j, dist in zip(near, dists):
+                c = costs[i] + dist
+                if c < costs[j] - 1e-9 and j != parent:
+                    x_j = tree.nodes[j].data
+                    x, u = self.P.new_state(x_new, x_j)
+                    if x != x_j:
+                        continue
+                    children[parents[j]].remove(j)
+                    tree.set_parent(j, i, u)
+                    parents[j] = i
+                    children[i].append(j)
+                    # propagate the improvement to the descendants of j
+                    delta = costs[j] - c
+                    pending = [j]
+                    while pending:
+                        k = pending.pop()
+                        costs[k] -= delta
+                        pending.extend(children[k])
+                        if is_goal[k] and costs[k] < best_cost:
+                            best = k; best_cost = costs[k]; improved = True
+
+            if improved:
+                self.solutions.append((started - budget.start, self._iterations_executed, best_cost))
+                if print_debug:
+                    print('Solution of cost %.2f after %d iterations' % (best_cost, self._iterations_executed))
+
+        self._best = best
+        self.stopped = budget.stopped
+        if best is None:
+            if print_debug:
+                if self.stopped:
+                    print('Stopped (%s) after %d iterations' % (self.stopped, self._iterations_executed))
+                else:
+                    print('Reached max number of iterations (%d)' % max_iter)
+            if show_vis:
+                self.visualize(tree, x_goal=x_goal, show=show_vis)
+            yield budget.progress(self._iterations_executed, (tree,), result=(None, tree))
+            return
+
+        node = tree.nodes[best]
+        self._final_nodes = {tree: node}
+        if show_vis:
+            self.visualize(tree, node.data, x_goal=x_goal, show=show_vis)
+        yield budget.progress(self._iterations_executed, (tree,), node.data, best_cost, (node.data, tree))
+
+    def cost(self):
+        ''' Returns the cost-to-come of the solution returned by the last call to build_rrt, or None if there was none. '''
+        return None if self._best is None else self.costs[self._best]
+
+
+class Budget(object):
+    ''' Stopping and reporting schedule of a search: a wall-clock time limit, a cancellation callback, and progress snapshots every `every` iterations.
+
+        The search loop only calls expired and report_due at the iterations returned by next_check, so with none of them in use it costs one integer comparison per iteration, and the clock is read every check_every iterations at most.
+    '''
+
+    def __init__(self, time_limit=None, should_stop=None, every=None, check_every=16):
+        self.start = time()
+        self.check_every = check_every
+        self.deadline = self.start + time_limit if time_limit is not None else None
+        self.should_stop = should_stop
+        self.every = every
+        self.next_report = every or maxint
+        self.stopped = None # 'time_limit' or 'cancelled' once expired returned True
+
+    def next_check(self, counter):
+        ''' Returns the iteration count at which the search should call expired and report_due next. '''
+        if self.deadline is None and self.should_stop is None:
+            return self.next_report
+        return min(counter + self.check_every, self.next_report)
+
+    def expired(self, now=None):
+        ''' Returns True if the time limit has passed or should_stop returns True. now is the current time, if the caller has just read it. '''
+        if self.deadline is not None and (now or time()) >= self.deadline:
+            self.stopped = 'time_limit'
+        elif self.should_stop is not None and self.should_stop():
+            self.stopped = 'cancelled'
+        return self.stopped is not None
+
+    def report_due(self, counter):
+        ''' Returns True if a snapshot is due after counter iterations, and schedules the next one. '''
+        if counter < self.next_report:
+            return False
+        self.next_report = (counter//self.every + 1)*self.every
+        return True
+
+    def progress(self, counter, trees, best=None, cost=None, result=None):
+        return Progress(counter, [len(tree.nodes) for tree in trees], best, cost, time() - self.start, result, self.stopped, trees)
+
+
+class Progress(object):
+    ''' Snapshot of a search, yielded by iter_rrt.
+
+        Attributes:
+        - iteration: number of iterations executed
+        - tree_sizes: number of nodes of each tree (init tree first)
+        - best: best solution state found so far, or None. Only RRTStar reports solutions before the last snapshot.
+        - cost: cost-to-come of best, for RRTStar
+        - elapsed: seconds since the search started
+        - result: None, except in the last snapshot, where it is the value returned by build_rrt
+        - stopped: 'time_limit' or 'cancelled' if the search was stopped early, as in RRTBase.stopped
+        - trees: the trees themselves, in the same order as tree_sizes. They keep growing as the search resumes.
+    '''
+
+    def __init__(self, iteration, tree_sizes, best=None, cost=None, elapsed=0., result=None, stopped=None, trees=()):
+        self.iteration = iteration
+        self.tree_sizes = tree_sizes
+        self.best = best
+        self.cost = cost
+        self.elapsed = elapsed
+        self.result = result
+        self.stopped = stopped
+        self.trees = trees
+
+    @property
+    def done(self):
+        return self.result is not None
+
+    def __repr__(self):
+        return 'Progress(iteration=%d, tree_sizes=%s, best=%s, cost=%s, elapsed=%.3f, done=%s)' % (
+            self.iteration, self.tree_sizes, self.best, self.cost, self.elapsed, self.done)
+
+
+class PlannerStats(object):
+    ''' Per-phase call counts and times of one build_rrt call, collected by solvers created with profile=True.
+
+        Phase times are exclusive: time spent in collision checks called by new_state counts as collision, not steering. Time outside every phase (tree updates, goal tests and the planner loop itself) is reported as other.
+    '''
+
+    # phase -> methods of the solver or problem that are timed as that phase
+    PHASES = [('sampling', ('random_state', 'random_states')),
+              ('nearest', ('nearest_neighbor', 'nearest_neighbors', 'nearest_position', 'near_neighbors')),
+              ('steering', ('new_state', 'new_states')),
+              ('collision', ('valid_state', 'valid_states', 'valid_edge', 'valid_edges', 'collides'))]
+
+    def __init__(self):
+        self.calls = dict((phase, 0) for phase, names in self.PHASES)
+        self.times = dict((phase, 0.) for phase, names in self.PHASES)
+        self.extensions = 0 # successful extensions, i.e. nodes added by extend, extend_many or BIRRT.step
+        self.rejected = 0 # extensions that did not find a new state
+        self.iterations = 0
+        self.total_time = 0.
+        self._open = [] # time spent in nested timed calls, for each timed call in progress
+
+    def instrument(self, obj):
+        ''' Shadows the methods of obj listed in PHASES, and the methods that add nodes (extend, extend_many, step), with instrumented versions stored as instance attributes. Returns a list of (obj, name, previous instance attribute or None) to undo it. '''
+        installed = []
+        for phase, names in self.PHASES:
+            for name in names:
+                if hasattr(obj, name):
+                    installed.append((obj, name, vars(obj).get(name)))
+                    setattr(obj, name, self.timed(phase, getattr(obj, name)))
+        for name in ('extend', 'extend_many', 'step'):
+            if hasattr(obj, name):
+                installed.append((obj, name, vars(obj).get(name)))
+                setattr(obj, name, self.counted(getattr(obj, name)))
+        return installed
+
+    def timed(self, phase, f):
+        calls = self.calls; times = self.times; open_calls = self._open
+        def wrapper(*args, **kwargs):
+            open_calls.append(0.)
+            start = time()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                elapsed = time() - start
+                times[phase] += elapsed - open_calls.pop()
+                calls[phase] += 1
+                if open_calls:
+                    open_calls[-1] += elapsed
+        return wrapper
+
+    def counted(self, extend):
+        def wrapper(*args, **kwargs):
+            result = extend(*args, **kwargs)
+            nodes = result if isinstance(result, list) else [result]
+            added = sum(1 for node in nodes if node is not None)
+            self.extensions += added
+            self.rejected += len(nodes) - added
+            return result
+        return wrapper
+
+    def other_time(self):
+        return self.total_time - sum(self.times.values())
+
+    def as_dict(self):
+        ''' Returns the statistics as a dictionary of plain numbers, e.g. for JSON output. '''
+        return {'calls': dict(self.calls), 'times': dict(self.times), 'other_time': self.other_time(), 'total_time': self.total_time,
+                'extensions': self.extensions, 'rejected': self.rejected, 'iterations': self.iterations}
+
+    def __str__(self):
+        lines = ['%-10s %9s %10s %7s' % ('phase', 'calls', 'time (s)', 'share')]
+        total = self.total_time or 1.
+        for phase, names in self.PHASES:
+            lines.append('%-10s %9d %10.4f %6.1f%%' % (phase, self.calls[phase], self.times[phase], 100*self.times[phase]/total))
+        lines.append('%-10s %9s %10.4f %6.1f%%' % ('other', '', self.other_time(), 100*self.other_time()/total))
+        lines.append('%d iterations, %d extensions, %d rejected, %.4f s' % (self.iterations, self.extensions, self.rejected, self.total_time))
+        return '\n'.join(lines)
+
+
 class Node(object):
     ''' Implementation of tree nodes. Each node stores:
         - data: the state that the node represents (expected as a tuple)
@@ -227,9 +795,18 @@ class Node(object):
 class Tree(object):
     ''' Basic tree implementation. ''' 
 
-    def __init__(self, root):
+    def __init__(self, root, index=None):
+        ''' Input arguments:
+        - root: state of the root node
+        - index: optional NeighborIndex instance, kept up to date with the states of the tree's nodes
+        '''
         self.root = Node(root) # not currently used, but could be useful
         self.nodes = [self.root] # list of nodes in tree
+        self.lookups = {} # prefix length s -> {state[:s]: position of first node with that prefix}, see get_node
+
+        self.index = index
+        if index is not None:
+            index.add(root)
 
     def add_node(self, data, parent_node, edge):
         ''' Adds a node to the tree.
@@ -238,12 +815,91 @@ class Tree(object):
         - x_new: new state to be added.
         - parent_node: Node object that is parent of new node.
         - edge: input action that transitions from parent state to new state.
+
+        Returns the new Node.
         '''
         assert isinstance(parent_node, Node), 'parent_node should be a Node instance'
 
         new_node = Node(data, parent_node, edge)
         self.nodes.append(new_node)
         parent_node.children.append(new_node)
+        self.register(data, len(self.nodes)-1)
+        return new_node
+
+    def set_parent(self, i, j, edge):
+        ''' Makes node j the parent of node i, with incoming edge edge (nodes are given by position). '''
+        node = self.nodes[i]
+        node.parent.children.remove(node)
+        node.parent = self.nodes[j]
+        node.incoming_edge = edge
+        node.parent.children.append(node)
+
+    def state_array(self):
+        ''' Returns the states of the tree's nodes as an (n, d) float array, in insertion order. '''
+        return np.array([node.data for node in self.nodes], dtype=float)
+
+    def arrays(self):
+        ''' Returns (states, parents, edges) arrays: the state of each node in insertion order, the position of its parent (-1 for the root), and its incoming edge (zero for the root). '''
+        position = dict((id(node), i) for i, node in enumerate(self.nodes))
+        states = np.array([node.data for node in self.nodes])
+        parents = np.array([-1] + [position[id(node.parent)] for node in self.nodes[1:]], dtype=np.int32)
+        if len(self.nodes) == 1:
+            return states, parents, np.zeros((1, 0))
+        edges = np.array([node.incoming_edge for node in self.nodes[1:]])
+        edges = np.concatenate([np.zeros((1, edges.shape[1]), dtype=edges.dtype), edges])
+        return states, parents, edges
+
+    def segments(self, start=1):
+        ''' Returns the edges into the nodes at positions start and after, as an (n-start, 2, d) array of (parent state, state) pairs. Used to draw only the nodes added since an earlier call. '''
+        nodes = self.nodes[max(start, 1):]
+        return np.array([(node.parent.data, node.data) for node in nodes], dtype=float).reshape(len(nodes), 2, len(self.root.data))
+
+    @staticmethod
+    def archive_path(path):
+        ''' Returns file path with the .npz extension appended if it lacks it, as np.savez does, so that save and load use the same file. Open files are returned unchanged. '''
+        if isinstance(path, basestring) and not path.endswith('.npz'):
+            return path + '.npz'
+        return path
+
+    def save(self, path):
+        ''' Saves the tree to file path as an uncompressed NumPy .npz archive of the arrays returned by arrays(), and returns the name of the file written (see archive_path). Load it with load or RRTBase.load_tree, from either name. '''
+        path = self.archive_path(path)
+        states, parents, edges = self.arrays()
+        np.savez(path, states=states, parents=parents, edges=edges)
+        return path
+
+    @classmethod
+    def load(cls, path, index=None):
+        ''' Returns the tree saved by save in file path, with neighbor index index if given. The .npz extension may be left out, as in save. '''
+        with np.load(cls.archive_path(path)) as archive:
+            return cls.from_arrays(archive['states'], archive['parents'], archive['edges'], index)
+
+    @classmethod
+    def from_arrays(cls, states, parents, edges, index=None):
+        ''' Returns a tree built from arrays as returned by arrays(). Parents may come after their children, as they do in trees rewired by RRTStar. '''
+        tree = cls(tuple(states[0].tolist()))
+        nodes = [tree.root] + [Node(tuple(x.tolist())) for x in states[1:]]
+        for node, p, u in zip(nodes[1:], parents[1:], edges[1:]):
+            node.parent = nodes[p]
+            node.incoming_edge = tuple(u.tolist())
+            nodes[p].children.append(node)
+        tree.nodes = nodes
+        tree.index_nodes(index)
+        return tree
+
+    def index_nodes(self, index):
+        ''' Sets the neighbor index of a tree built without one, and adds the states of all its nodes. '''
+        self.index = index
+        if index is not None:
+            for node in self.nodes:
+                index.add(node.data)
+
+    def register(self, data, i):
+        ''' Adds the state of the node at position i to the neighbor index and lookup tables. '''
+        if self.index is not None:
+            self.index.add(data)
+        for s, table in self.lookups.items():
+            table.setdefault(data[:s], i)
 
     def get_node(self, state):
         ''' Given a state, returns the corresponding node in the tree.
@@ -254,24 +910,30 @@ class Tree(object):
         Returns:
         - first Node in the tree that corresponds to the input state. 
         - None if the tree doesn't have a node representing the desired state. 
+
+        The lookup table for prefixes of length s is built on the first query of that length and kept up to date as nodes are added, so later queries take O(1) time.
         '''
         s = len(state)
-        for node in self.nodes:
-            if node.data[:s] == state:
-                return node
-        return None
+        table = self.lookups.get(s)
+        if table is None:
+            table = {}
+            for i, node in enumerate(self.nodes):
+                table.setdefault(node.data[:s], i)
+            self.lookups[s] = table
+        i = table.get(state)
+        return None if i is None else self.nodes[i]
 
     def get_path(self, x_goal):
         ''' Returns path from start state to goal state.
 
         Input arguments:
-        - x_goal: goal state.
+        - x_goal: goal state, or the node representing it.
         
         Returns: 
         - path: list of states.
         - inputs: list of inputs to get from start state to goal state.
         '''
-        node = self.get_node(x_goal)
+        node = x_goal if isinstance(x_goal, Node) else self.get_node(x_goal)
         path = []
         inputs = []
         while node: # this should iterate until it reaches the root node
@@ -282,3 +944,164 @@ class Tree(object):
         inputs = inputs[:-1] # last input is None for root
         inputs.reverse()
         return path, inputs
+
+
+class ArrayNode(Node):
+    ''' Lightweight view on a node of an ArrayTree. Views are created on demand; two views on the same node compare equal. '''
+
+    __slots__ = ('tree', 'id')
+
+    def __init__(self, tree, id):
+        self.tree = tree
+        self.id = id
+
+    @property
+    def data(self):
+        return tuple(self.tree.states[self.id].tolist())
+
+    @property
+    def parent(self):
+        p = self.tree.parents[self.id]
+        return ArrayNode(self.tree, int(p)) if p >= 0 else None
+
+    @property
+    def incoming_edge(self):
+        if self.tree.parents[self.id] < 0 or self.tree.edges is None or np.isnan(self.tree.edges[self.id, 0]):
+            return None
+        return tuple(self.tree.edges[self.id].tolist())
+
+    @property
+    def children(self):
+        return [ArrayNode(self.tree, i) for i in np.flatnonzero(self.tree.parents[:len(self.tree)] == self.id)]
+
+    def __eq__(self, other):
+        return isinstance(other, ArrayNode) and self.tree is other.tree and self.id == other.id
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self.tree), self.id))
+
+
+class ArrayTree(Tree):
+    ''' Tree that stores states, parent indices and incoming edges in contiguous NumPy arrays, which grow by doubling. Nodes are returned as ArrayNode views.
+
+        States and edges are stored as floats, so they are returned as tuples of floats.
+    '''
+
+    def __init__(self, root, index=None, capacity=1024):
+        ''' Input arguments:
+        - root: state of the root node
+        - index: optional NeighborIndex instance, kept up to date with the states of the tree's nodes
+        - capacity: number of nodes to allocate space for initially
+        '''
+        self.states = np.empty((capacity, len(root)))
+        self.parents = np.empty(capacity, dtype=np.int32)
+        self.edges = None # allocated on the first add_node, once the input dimension is known
+        self.n = 0
+
+        self.nodes = ArrayNodes(self)
+        self.lookups = {}
+        self.append(root, -1, None)
+        self.root = self.nodes[0]
+
+        self.index = index
+        if index is not None:
+            index.add(root)
+
+    def __len__(self):
+        return self.n
+
+    def state_array(self):
+        return self.states[:self.n]
+
+    def set_parent(self, i, j, edge):
+        self.parents[i] = j
+        self.edges[i] = edge
+
+    def arrays(self):
+        n = self.n
+        edges = np.zeros((n, 0)) if self.edges is None else self.edges[:n].copy()
+        edges[0] = 0
+        return self.states[:n], self.parents[:n], edges
+
+    def segments(self, start=1):
+        children = np.arange(max(start, 1), self.n)
+        return np.stack((self.states[self.parents[children]], self.states[children]), axis=1)
+
+    @classmethod
+    def from_arrays(cls, states, parents, edges, index=None):
+        n = len(states)
+        tree = cls(tuple(states[0].tolist()), capacity=n)
+        tree.states[:] = states
+        tree.parents[:] = parents
+        if edges.shape[1]:
+            tree.edges = np.array(edges, dtype=float)
+            tree.edges[0] = np.nan
+        tree.n = n
+        tree.index_nodes(index)
+        return tree
+
+    def append(self, data, parent, edge):
+        ''' Stores a node and returns its id. '''
+        if self.n == len(self.parents):
+            self.states = grow(self.states)
+            self.parents = grow(self.parents)
+            if self.edges is not None:
+                self.edges = grow(self.edges)
+        if edge is not None and self.edges is None:
+            self.edges = np.full((len(self.parents), len(edge)), np.nan)
+
+        i = self.n
+        self.states[i] = data
+        self.parents[i] = parent
+        if self.edges is not None:
+            self.edges[i] = np.nan if edge is None else edge
+        self.n += 1
+        return i
+
+    def add_node(self, data, parent_node, edge):
+        ''' Adds a node to the tree.
+
+        Input arguments:
+        - x_new: new state to be added.
+        - parent_node: ArrayNode of this tree that is parent of new node.
+        - edge: input action that transitions from parent state to new state.
+
+        Returns the new ArrayNode.
+        '''
+        assert isinstance(parent_node, ArrayNode) and parent_node.tree is self, 'parent_node should be a node of this tree'
+
+        i = self.append(data, parent_node.id, edge)
+        self.register(data, i)
+        return ArrayNode(self, i)
+
+
+def grow(a):
+    ''' Returns a copy of array a with twice as many rows. '''
+    b = np.empty((2*len(a),) + a.shape[1:], dtype=a.dtype)
+    b[:len(a)] = a
+    return b
+
+
+class ArrayNodes(object):
+    ''' Sequence of ArrayNode views over the nodes of an ArrayTree, in insertion order. '''
+
+    def __init__(self, tree):
+        self.tree = tree
+
+    def __len__(self):
+        return len(self.tree)
+
+    def __getitem__(self, i):
+        n = len(self.tree)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError('node index out of range')
+        return ArrayNode(self.tree, i)
+
+    def __iter__(self):
+        for i in xrange(len(self.tree)):
+            yield ArrayNode(self.tree, i)
@@ -0,0 +1,144 @@
+''' Module runner runs independent build_rrt trials, optionally spread across a multiprocessing pool, and collects their statistics. race runs differently seeded planners in parallel and returns the first solution found.
+
+    Problems are not sent to the workers: each worker calls make_problem once when it starts, so maps (and C-space volumes) are loaded once per worker rather than once per trial. Every trial seeds the random module from (seed, trial number) before it starts, so results depend only on the seed and not on the number of processes or on which worker runs which trial.
+'''
+
+import multiprocessing, random, time
+import numpy as np
+from rrt import PlannerStats
+
+
+_solver = None # solver of the current worker process, set by init_worker
+_portfolio = None # solvers of the current racing process and their build_rrt keyword arguments, set by init_racer
+_stop = None # multiprocessing.Event set once a racing run has solved the problem
+
+
+def init_worker(make_problem, make_solver):
+    ''' Builds the problem and solver used by every trial in this process. '''
+    global _solver
+    _solver = make_solver(make_problem())
+
+
+def run_trial(args):
+    ''' Runs one trial and returns (solved, iterations, tree sizes, seconds, stats), where stats is the solver's PlannerStats as a dictionary, or None if the solver does not profile. '''
+    trial, seed, max_iter, kwargs = args
+    random.seed((seed, trial))
+    if getattr(_solver.P, 'sampler', None) is not None:
+        _solver.P.sampler.clear() # drop samples drawn before reseeding
+    start = time.time()
+    result = _solver.build_rrt(_solver.P.x_init, _solver.P.x_goal, max_iter, **kwargs)
+    elapsed = time.time() - start
+    stats = _solver.stats.as_dict() if _solver.stats is not None else None
+    return result[0] is not None, _solver._iterations_executed, [len(tree.nodes) for tree in result[1:]], elapsed, stats
+
+
+def run_trials(make_problem, make_solver, n_trials, max_iter, processes=None, seed=0, **kwargs):
+    ''' Runs n_trials calls of build_rrt(x_init, x_goal, max_iter, **kwargs) and returns their results, in trial order, as a list of (solved, iterations, tree sizes, seconds, stats) as returned by run_trial.
+
+        Input arguments:
+        - make_problem: function returning the Problem, called once per process
+        - make_solver: function taking the Problem and returning the solver, e.g. rrt.BIRRT, or partial(rrt.BIRRT, profile=True) to collect per-phase statistics
+        - processes: number of worker processes; defaults to the number of CPUs. With processes=1 the trials run in this process.
+        - seed: base seed of the trials
+    '''
+    processes = processes or multiprocessing.cpu_count()
+    tasks = [(trial, seed, max_iter, kwargs) for trial in xrange(n_trials)]
+    if processes == 1:
+        init_worker(make_problem, make_solver)
+        return map(run_trial, tasks)
+
+    pool = multiprocessing.Pool(processes, init_worker, (make_problem, make_solver))
+    try:
+        return pool.map(run_trial, tasks, chunksize=1)
+    finally:
+        pool.terminate()
+
+
+def init_racer(make_problem, portfolio, stop):
+    ''' Builds the problem and the solvers of the portfolio used by every run in this process. '''
+    global _portfolio, _stop
+    problem = make_problem()
+    _portfolio = [(make_solver(problem), kwargs) for make_solver, kwargs in portfolio]
+    _stop = stop
+
+
+def race_run(args):
+    ''' Runs one planner of the portfolio until it solves the problem or another run does. Returns (run, states, inputs, iterations, seconds), with states and inputs None if the run did not find a solution. '''
+    run, seed, max_iter = args
+    if _stop.is_set():
+        return run, None, None, 0, 0.
+    solver, kwargs = _portfolio[run % len(_portfolio)]
+    random.seed((seed, run))
+    if getattr(solver.P, 'sampler', None) is not None:
+        solver.P.sampler.clear()
+    start = time.time()
+    result = solver.build_rrt(solver.P.x_init, solver.P.x_goal, max_iter, should_stop=_stop.is_set, **kwargs)
+    elapsed = time.time() - start
+    if result[0] is None:
+        return run, None, None, solver._iterations_executed, elapsed
+    _stop.set()
+    states, inputs = solver.get_solution_from_tree(*result)
+    return run, states, inputs, solver._iterations_executed, elapsed
+
+
+def race(make_problem, portfolio, n_runs, max_iter, processes=None, seed=0):
+    ''' Runs n_runs planners at once, each in its own process, and returns the first solution found as (run, states, inputs, iterations, seconds), as returned by race_run. Once a run finds a solution, the others stop within check_every iterations (see RRTBase). Returns None if no run finds a solution within max_iter iterations.
+
+        Input arguments:
+        - make_problem: function returning the Problem, called once per process
+        - portfolio: list of (make_solver, kwargs), where make_solver takes the Problem and returns a solver, and kwargs are passed to its build_rrt, e.g. [(rrt.BIRRT, {}), (rrt.BIRRT, {'connect': 'both'})]. Run i uses entry i modulo the length of the portfolio, and seeds the random module from (seed, i) as run_trial does. kwargs may include a time_limit.
+        - processes: number of worker processes; defaults to the number of CPUs, or n_runs if smaller. Runs that do not fit queue until a process is free. Racing more processes than CPUs makes every run proportionally slower, which on the bundled maps outweighs the gain of keeping the fastest run. With processes=1 the runs take turns in this process.
+    '''
+    processes = processes or min(n_runs, multiprocessing.cpu_count())
+    stop = multiprocessing.Event()
+    tasks = [(run, seed, max_iter) for run in xrange(n_runs)]
+    if processes == 1:
+        init_racer(make_problem, portfolio, stop)
+        for task in tasks:
+            result = race_run(task)
+            if result[1] is not None:
+                return result
+        return None
+
+    pool = multiprocessing.Pool(processes, init_racer, (make_problem, portfolio, stop))
+    try:
+        for result in pool.imap_unordered(race_run, tasks):
+            if result[1] is not None:
+                stop.set()
+                pool.close()
+                pool.join() # the other runs return within a few iterations
+                return result
+        return None
+    finally:
+        pool.terminate()
+
+
+def print_stats(results, wall_time=None):
+    ''' Prints iteration counts and tree sizes as reported by the benchmark scripts. '''
+    counts = [r[1] for r in results]
+    print "counts", counts
+    for t in xrange(len(results[0][2])):
+        sizes = [r[2][t] for r in results]
+        print "t%dcount" % (t+1), sizes
+
+    print "solved:\t\t", sum(r[0] for r in results), "/", len(results)
+    print "iterations:\t", np.mean(counts), np.std(counts)
+    for t in xrange(len(results[0][2])):
+        sizes = [r[2][t] for r in results]
+        print "t%d extensions\t" % (t+1), np.mean(sizes), np.std(sizes)
+    print "time per run:\t", np.mean([r[3] for r in results])
+    if wall_time is not None:
+        print "wall time:\t", wall_time
+    phases = phase_times(results)
+    if phases:
+        print "mean time per phase:\t", ", ".join("%s %.4f s" % (phase, t) for phase, t in phases)
+
+
+def phase_times(results):
+    ''' Returns a list of (phase, mean time per trial) from the stats of profiled trials, or an empty list. '''
+    stats = [r[4] for r in results if r[4] is not None]
+    if not stats:
+        return []
+    phases = [phase for phase, names in PlannerStats.PHASES]
+    return ([(phase, np.mean([s['times'][phase] for s in stats])) for phase in phases]
+            + [('other', np.mean([s['other_time'] for s in stats]))])
@@ -0,0 +1,124 @@
+''' Module smoothing shortens solution paths by shortcutting. To use it, initialize a PathSmoother with a Problem instance, and call smooth(states) on the list of states returned by get_solution_from_tree.
+
+    Shortcuts are straight segments (with the rotation turning the short way around for 3-D states), accepted if the problem's valid_edge accepts them: BitmapProblem, ObstacleProblem and MovingRectangleProblem check the whole segment. The edges of the input path are kept as they are, without checking them, so smoothing never rejects a path the planner returned.
+'''
+
+import math, random
+from bisect import bisect_right
+from time import time
+
+
+class PathSmoother(object):
+    ''' Greedy and randomized shortcutting, with segment checks memoized across calls. '''
+
+    def __init__(self, problem):
+        self.P = problem
+        self.cache = {} # (x1, x2) -> result of P.valid_edge, with x1 <= x2
+        self.checks = 0 # calls to P.valid_edge
+        self.hits = 0 # segment checks answered from the cache
+        self.report = None # statistics of the last call to smooth
+
+    def valid(self, x1, x2):
+        ''' Memoized P.valid_edge. '''
+        key = (x1, x2) if x1 <= x2 else (x2, x1)
+        valid = self.cache.get(key)
+        if valid is None:
+            self.checks += 1
+            valid = self.cache[key] = bool(self.P.valid_edge(x1, x2))
+        else:
+            self.hits += 1
+        return valid
+
+    def distance(self, x1, x2):
+        return math.sqrt(self.P.metric(x1, x2))
+
+    def length(self, states):
+        ''' Returns the length of the path through states, as measured by sqrt(P.metric). '''
+        return sum(self.distance(x1, x2) for x1, x2 in zip(states, states[1:]))
+
+    def smooth(self, states, time_limit=0.1, max_iter=1000):
+        ''' Returns (states, inputs) for a path from states[0] to states[-1] that is no longer than the path through states.
+
+            The path is first shortcut greedily, then by up to max_iter randomized shortcuts between points anywhere on the path, then greedily again. Work stops when time_limit seconds have passed. Sets self.report to a dictionary with the number of waypoints and path length before and after, the number of segment checks and cache hits, and the time taken.
+        '''
+        start = time()
+        deadline = start + time_limit
+        checks = self.checks; hits = self.hits
+
+        path = self.greedy(list(states), deadline)
+        path = self.randomized(path, deadline, max_iter)
+        path = self.greedy(path, deadline)
+
+        self.report = {'waypoints': (len(states), len(path)),
+                       'length': (self.length(states), self.length(path)),
+                       'edge_checks': self.checks - checks,
+                       'cache_hits': self.hits - hits,
+                       'time': time() - start}
+        return path, [edge_input(x1, x2) for x1, x2 in zip(path, path[1:])]
+
+    def greedy(self, path, deadline=None):
+        ''' Connects each waypoint, starting from the first, to the furthest later waypoint it has a valid segment to. '''
+        result = [path[0]]
+        i = 0
+        while i < len(path) - 1:
+            if deadline is not None and time() > deadline:
+                return result + path[i+1:]
+            j = len(path) - 1
+            while j > i + 1 and not self.valid(path[i], path[j]):
+                j -= 1
+            result.append(path[j])
+            i = j
+        return result
+
+    def randomized(self, path, deadline=None, max_iter=1000):
+        ''' Repeatedly picks two random points on the path, on different edges, and replaces the part of the path between them by a straight segment if it is valid and shorter. '''
+        cumulative = self.cumulative(path)
+        for k in xrange(max_iter):
+            if deadline is not None and time() > deadline:
+                break
+            a = random.uniform(0, cumulative[-1]); b = random.uniform(0, cumulative[-1])
+            if a > b:
+                a, b = b, a
+            i = min(bisect_right(cumulative, a), len(path) - 1) - 1 # a lies on edge i, from path[i] to path[i+1]
+            j = min(bisect_right(cumulative, b), len(path) - 1) - 1
+            if i == j:
+                continue
+            pa = self.point(path, cumulative, i, a); pb = self.point(path, cumulative, j, b)
+            if self.distance(pa, pb) >= b - a - 1e-9 or not self.valid(pa, pb):
+                continue
+            path = path[:i+1] + [x for x in (pa, pb) if x != path[i] and x != path[j+1]] + path[j+1:]
+            cumulative = self.cumulative(path)
+        return path
+
+    def cumulative(self, path):
+        ''' Returns the length of the path up to each waypoint. '''
+        lengths = [0.]
+        for x1, x2 in zip(path, path[1:]):
+            lengths.append(lengths[-1] + self.distance(x1, x2))
+        return lengths
+
+    def point(self, path, cumulative, i, s):
+        ''' Returns the point of edge i at distance s from the start of the path. '''
+        edge = cumulative[i+1] - cumulative[i]
+        return interpolate(path[i], path[i+1], (s - cumulative[i])/edge if edge else 0.)
+
+
+def interpolate(x1, x2, t):
+    ''' Returns the state at fraction t of the segment from x1 to x2. A third coordinate is a rotation, which turns the short way around and is kept in [-pi, pi). '''
+    if t <= 0:
+        return x1
+    if t >= 1:
+        return x2
+    x = (x1[0] + t*(x2[0]-x1[0]), x1[1] + t*(x2[1]-x1[1]))
+    if len(x1) == 3:
+        r = (x2[2]-x1[2] + math.pi) % (2*math.pi) - math.pi
+        x += ((x1[2] + t*r + math.pi) % (2*math.pi) - math.pi,)
+    return x
+
+
+def edge_input(x1, x2):
+    ''' Returns the input that moves from x1 to x2 along a straight segment, as new_state would for a step shorter than max_step. '''
+    u = (x2[0]-x1[0], x2[1]-x1[1])
+    if len(x1) == 3:
+        u += ((x2[2]-x1[2] + math.pi) % (2*math.pi) - math.pi,)
+    return u
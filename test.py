@@ -1,7 +1,15 @@
 import unittest
 from problem import *
 from rrt import *
-from math import sqrt
+from neighbors import *
+from math import sqrt, pi
+import math
+import random, os, shutil, tempfile
+from functools import partial
+from rectangle_problem import MovingRectangleProblem
+from runner import run_trials, race
+from smoothing import PathSmoother
+from prm import PRM, problem_key
 
 class TestBasic2DProblem(unittest.TestCase):
 
@@ -77,6 +85,163 @@ class TestBitmapProblem(unittest.TestCase):
 		self.assertTrue(self.p.valid_state((50,50)))
 		self.assertFalse(self.p.valid_state((501,501)))
 
+	def test_valid_states(self):
+		states = [(250,250), (50,50), (501,501), (50.9,50.9)]
+		self.assertEqual(list(self.p.valid_states(states)), [self.p.valid_state(x) for x in states])
+		self.assertEqual(self.p.valid_states([]).shape, (0,))
+
+
+class TestFreeSampling(unittest.TestCase):
+
+	def test_bitmap(self):
+		random.seed(0)
+		p = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, free_sampling=True)
+		states = [p.random_state() for i in range(5000)] + p.random_states(5000)
+		self.assertTrue(all(p.valid_state(x) for x in states))
+		self.assertTrue(all(isinstance(c, int) for c in states[0]))
+		self.assertGreater(len(set(states)), 5000)
+		# uniform over free pixels: about as many samples in each half of the free space
+		left = (p.free_pixels % p.free.shape[1] < 250).mean()
+		self.assertAlmostEqual(np.mean([x < 250 for x, y in states]), left, delta=0.03)
+
+	def test_reseed(self):
+		p = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, free_sampling=True)
+		samples = []
+		for i in range(2):
+			random.seed(1)
+			p.sampler.clear()
+			samples.append(p.random_states(10) + [p.random_state() for j in range(5000)])
+		self.assertEqual(samples[0], samples[1])
+
+	def test_rectangle(self):
+		random.seed(0)
+		for angle_bins in (None, 16):
+			p = MovingRectangleProblem(Image.open('./test_bitmap.png'), 10, 20, (80,250,0), (420,250,0), 20, max_rot=pi/18, angle_bins=angle_bins, cache_dir=None, free_sampling=True)
+			states = p.random_states(2000)
+			self.assertEqual(len(states), 2000)
+			self.assertTrue(all(p.valid_state(x) for x in states))
+			self.assertGreater(np.std([r for x, y, r in states]), 1.5)
+
+class TestBitmapEdges(unittest.TestCase):
+
+	def setUp(self):
+		# 1-pixel wall at x = 10, with a gap at y = 5
+		image = Image.new('1', (20, 20), 1)
+		for y in range(20):
+			if y != 5:
+				image.putpixel((10, y), 0)
+		self.p = BitmapProblem(image=image, init=(2,2), goal=(18,2), max_step=20, check_edges=True)
+
+	def test_new_state(self):
+		self.assertEqual(self.p.new_state((2.,2.), (18.,2.)), (None, None))
+		self.assertEqual(self.p.new_state((2.,5.5), (18.,5.5))[0], (18.,5.5))
+		self.p.check_edges = False
+		self.assertEqual(self.p.new_state((2.,2.), (18.,2.))[0], (18.,2.))
+
+	def test_valid_edge(self):
+		self.assertFalse(self.p.valid_edge((9.5,4.5), (10.5,6.5))) # enters the wall at pixel (10, 6)
+		self.assertTrue(self.p.valid_edge((9.9,5.5), (10.5,5.9)))
+		self.assertFalse(self.p.valid_edge((2.,2.), (10.,2.))) # ends on the wall
+		self.assertTrue(self.p.valid_edge((2.,2.), (9.99,2.)))
+		self.assertFalse(self.p.valid_edge((2,2), (14,3))) # integer states, as drawn by random_state
+		self.assertFalse(self.p.valid_edge((2,2), (18,3)))
+		self.assertEqual(self.p.valid_edge((2,4), (18,7)), self.p.valid_edge((2.,4.), (18.,7.)))
+
+	def test_valid_edges(self):
+		random.seed(0)
+		a = [(random.uniform(0,19), random.uniform(0,19)) for i in range(500)]
+		b = [(random.uniform(0,19), random.uniform(0,19)) for i in range(500)]
+		self.assertEqual(list(self.p.valid_edges(a, b)), [self.p.valid_edge(x1, x2) for x1, x2 in zip(a, b)])
+
+
+class TestClearance(unittest.TestCase):
+
+	def setUp(self):
+		image = Image.open('./test_bitmap.png')
+		self.p = BitmapProblem(image=image, init=(80,250), goal=(420,250), max_step=20, clearance=True)
+
+	def test_clearance_at(self):
+		random.seed(0)
+		for i in range(200):
+			x = (random.uniform(0, 499), random.uniform(0, 499))
+			c = self.p.clearance_at(x)
+			a = random.uniform(0, 2*pi); d = random.uniform(0, max(c-2, 0))
+			y = (x[0] + d*math.cos(a), x[1] + d*math.sin(a))
+			self.assertTrue(c <= 2 or self.p.valid_state(y))
+		self.assertEqual(self.p.clearance_at((250,250)), 0)
+
+	def test_same_plan(self):
+		results = []
+		for clearance in (False, True):
+			p = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, check_edges=True, clearance=clearance)
+			random.seed(0)
+			solver = BIRRT(p)
+			final_state, t1, t2 = solver.build_rrt(p.x_init, p.x_goal, 2000)
+			results.append((final_state, [n.data for n in t1.nodes]))
+		self.assertEqual(results[0], results[1])
+
+	def test_rectangle(self):
+		p = MovingRectangleProblem(Image.open('./test_bitmap.png'), 20, 40, (80,250,0), (420,250,0), 20, max_rot=pi/18)
+		q = MovingRectangleProblem(Image.open('./test_bitmap.png'), 20, 40, (80,250,0), (420,250,0), 20, max_rot=pi/18, clearance=True)
+		random.seed(0)
+		for i in range(500):
+			x = p.random_state()
+			if p.valid_state(x):
+				self.assertTrue(q.valid_state(x) or q.clearance_at(x) < q.inner_radius)
+			else:
+				self.assertFalse(q.valid_state(x))
+
+
+class TestMovingRectangleProblem(unittest.TestCase):
+
+	def setUp(self):
+		self.p = MovingRectangleProblem(Image.open('./test_bitmap.png'), 20, 40, (80,250,0), (420,250,0), 20, max_rot=pi/18)
+
+	def test_collides(self):
+		self.assertFalse(self.p.collides((80,250,0)))
+		self.assertTrue(self.p.collides((250,250,0)))
+		self.assertTrue(self.p.collides((5,250,0))) # out of bounds
+		self.assertFalse(self.p.collides((30,250,0)))
+		self.assertTrue(self.p.collides((30,250,pi/2)))
+
+	def test_collides_batch(self):
+		random.seed(0)
+		states = [self.p.random_state() for i in range(1000)]
+		self.assertEqual(list(self.p.collides(np.array(states))), [self.p.collides(x) for x in states])
+		self.assertEqual(list(self.p.valid_states(states)), [self.p.valid_state(x) for x in states])
+
+	def test_metric_matrix(self):
+		random.seed(0)
+		xs = [self.p.random_state() for i in range(50)]
+		ys = [self.p.random_state() for i in range(20)] + [(x[0], x[1], -x[2]) for x in xs[:5]]
+		self.assertEqual(self.p.metric_matrix(xs, ys).tolist(), [self.p.metric_many(xs, y).tolist() for y in ys])
+		self.assertEqual(self.p.metric_matrix(xs, []).shape, (0, 50))
+
+
+class TestCSpace(unittest.TestCase):
+
+	def setUp(self):
+		self.cache_dir = tempfile.mkdtemp()
+		self.p = MovingRectangleProblem(Image.open('./test_bitmap.png'), 20, 40, (80,250,0), (420,250,0), 20, max_rot=pi/18)
+		self.q = MovingRectangleProblem(Image.open('./test_bitmap.png'), 20, 40, (80,250,0), (420,250,0), 20, max_rot=pi/18, angle_bins=16, cache_dir=self.cache_dir)
+
+	def tearDown(self):
+		shutil.rmtree(self.cache_dir)
+
+	def test_conservative(self):
+		random.seed(0)
+		for i in range(2000):
+			x = self.p.random_state()
+			if self.q.valid_state(x):
+				self.assertTrue(self.p.valid_state(x), 'C-space volume accepts colliding state %s' % (x,))
+
+	def test_cache(self):
+		self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+		q = MovingRectangleProblem(Image.open('./test_bitmap.png'), 20, 40, (80,250,0), (420,250,0), 20, max_rot=pi/18, angle_bins=16, cache_dir=self.cache_dir)
+		self.assertTrue((q.cspace == self.q.cspace).all())
+		MovingRectangleProblem(Image.open('./test_bitmap.png'), 20, 30, (80,250,0), (420,250,0), 20, max_rot=pi/18, angle_bins=16, cache_dir=self.cache_dir)
+		self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
 
 class TestObstacleProblem(unittest.TestCase):
 
@@ -95,6 +260,34 @@ class TestObstacleProblem(unittest.TestCase):
 		for o in obstacles:
 			self.assertFalse(self.p.inside_circle(self.p.x_init,o), 'init inside obstacle')
 			self.assertFalse(self.p.inside_circle(self.p.x_goal,o), 'goal inside obstacle')
+		self.assertEqual(len(obstacles), 10)
+
+	def test_collides(self):
+		random.seed(0)
+		p = ObstacleProblem(n_obstacles=2000, max_radius=0.01)
+		states = [p.random_state() for i in range(1000)]
+		expected = [any(p.inside_circle(x, o) for o in p.obstacles) for x in states]
+		self.assertEqual([p.collides(x) for x in states], expected)
+		self.assertEqual(list(p.collides(np.array(states))), expected)
+
+	def test_large_obstacles(self):
+		# circles much larger than the grid cells
+		p = ObstacleProblem(obstacles=[((0.2,0.2),0.15), ((0.7,0.3),0.4)] + [((0.9,0.9),0.001)]*50)
+		self.assertTrue(p.collides((0.2,0.3)))
+		self.assertTrue(p.collides((0.9,0.6)))
+		self.assertFalse(p.collides((0.1,0.9)))
+
+	def test_mixed_radii(self):
+		# one large circle among many small ones does not make every cell large
+		random.seed(2)
+		obstacles = [((random.uniform(0,1), random.uniform(0,1)), 0.003) for i in range(1000)] + [((0.5,0.5),0.2)]
+		p = ObstacleProblem(obstacles=obstacles)
+		self.assertLess(p.cell, 0.05)
+		states = [p.random_state() for i in range(500)]
+		expected = [any(p.inside_circle(x, o) for o in obstacles) for x in states]
+		self.assertTrue(any(expected))
+		self.assertEqual([p.collides(x) for x in states], expected)
+		self.assertEqual(list(p.collides(np.array(states))), expected)
 
 
 class TestTree(unittest.TestCase):
@@ -115,6 +308,37 @@ class TestTree(unittest.TestCase):
 		self.assertEqual(node.parent.data, (0,0))
 		self.assertEqual(node.incoming_edge, (1,1))
 
+	def test_get_node_prefix(self):
+		self.t.add_node((2,2), self.t.root, (1,1))
+		self.assertEqual(self.t.get_node((2,)).data, (2,2))
+		self.t.add_node((3,0), self.t.root, (3,0))
+		self.t.add_node((3,1), self.t.root, (3,1))
+		self.assertEqual(self.t.get_node((3,)).data, (3,0))
+		self.assertEqual(self.t.get_node((3,1)).data, (3,1))
+		self.assertEqual(self.t.get_node((4,)), None)
+
+	def test_get_path(self):
+		self.t.add_node((2,2), self.t.root, (1,1))
+		self.t.add_node((3,0), self.t.get_node((2,2)), (1,-2))
+		self.t.add_node((1,1), self.t.get_node((2,2)), (-1,-1))
+		(path, inputs) = self.t.get_path((3,0))
+		self.assertEqual(path, [(0,0),(2,2),(3,0)])
+		self.assertEqual(inputs, [(1,1),(1,-2)])
+
+
+class TestArrayTree(unittest.TestCase):
+
+	def setUp(self):
+		self.t = ArrayTree((0,0), capacity=2)
+
+	def test_add_node(self):
+		self.t.add_node((2,2), self.t.root, (1,1))
+		self.assertEqual([node.data for node in self.t.nodes], [(0,0),(2,2)])
+		self.assertEqual(self.t.nodes[-1].parent, self.t.root)
+		self.assertEqual(self.t.nodes[-1].incoming_edge, (1,1))
+		self.assertEqual(self.t.root.incoming_edge, None)
+		self.assertEqual(self.t.root.children, [self.t.nodes[1]])
+
 	def test_get_path(self):
 		self.t.add_node((2,2), self.t.root, (1,1))
 		self.t.add_node((3,0), self.t.get_node((2,2)), (1,-2))
@@ -123,6 +347,79 @@ class TestTree(unittest.TestCase):
 		self.assertEqual(path, [(0,0),(2,2),(3,0)])
 		self.assertEqual(inputs, [(1,1),(1,-2)])
 
+	def test_matches_tree(self):
+		image = Image.open('./test_bitmap.png')
+		p = BitmapProblem(image=image, init=(80,250), goal=(420,250), max_step=20, goal_tolerance=5)
+		results = []
+		for tree_class in (Tree, ArrayTree):
+			random.seed(0)
+			solver = BIRRT(p, index=GridIndex, tree_class=tree_class)
+			final_state, t1, t2 = solver.build_rrt(p.x_init, p.x_goal, 2000)
+			results.append((final_state, [n.data for n in t1.nodes], solver.get_solution_from_tree(final_state, t1, t2)))
+		self.assertEqual(results[0], results[1])
+
+
+class TestTreeSnapshots(unittest.TestCase):
+
+	def setUp(self):
+		self.p = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, goal_tolerance=5)
+		self.dir = tempfile.mkdtemp()
+		self.path = os.path.join(self.dir, 'tree.npz')
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def paths(self, tree):
+		return [tree.get_path(node) for node in tree.nodes]
+
+	def test_round_trip(self):
+		random.seed(8)
+		solver = RRTStar(self.p) # rewiring leaves parents after some of their children
+		final_state, tree = solver.build_rrt(self.p.x_init, self.p.x_goal, 1000)
+		self.assertTrue(any(node.parent is not None and tree.nodes.index(node.parent) > i for i, node in enumerate(tree.nodes)))
+		for tree_class in (Tree, ArrayTree):
+			tree.save(self.path)
+			loaded = tree_class.load(self.path, GridIndex(self.p))
+			self.assertEqual(self.paths(loaded), self.paths(tree))
+			self.assertEqual(loaded.index.nearest((300,300)), tree.index.nearest((300,300)))
+			tree = loaded
+		self.assertEqual(self.paths(Tree.load(self.path)), self.paths(tree))
+		Tree((0,0)).save(self.path)
+		self.assertEqual(len(ArrayTree.load(self.path).nodes), 1)
+
+		# np.savez appends .npz to the file name; load finds the file under the name given to save
+		path = os.path.join(self.dir, 'snapshot')
+		self.assertEqual(tree.save(path), path + '.npz')
+		self.assertEqual(sorted(os.listdir(self.dir)), ['snapshot.npz', 'tree.npz'])
+		self.assertEqual(self.paths(Tree.load(path)), self.paths(tree))
+		self.assertEqual(self.paths(solver.load_tree(path + '.npz')), self.paths(tree))
+
+	def test_warm_start(self):
+		p2 = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,150), 20, goal_tolerance=5) # same map and start, another goal
+		for make_solver, kwargs in ((partial(RRT, index=GridIndex), {'goal_bias': 0.05}), (partial(RRT, tree_class=ArrayTree), {'goal_bias': 0.05}), (partial(BIRRT, index=GridIndex), {})):
+			random.seed(9)
+			result = make_solver(self.p).build_rrt(self.p.x_init, self.p.x_goal, 5000, **kwargs)
+			self.assertIsNotNone(result[0])
+			result[1].save(self.path)
+
+			solver = make_solver(p2)
+			tree = solver.load_tree(self.path)
+			size = len(tree.nodes)
+			result = solver.build_rrt(p2.x_init, p2.x_goal, 5000, tree=tree, **kwargs)
+			self.assertIs(result[1], tree)
+			self.assertGreaterEqual(len(tree.nodes), size)
+			states = solver.get_solution_from_tree(*result)[0]
+			self.assertEqual(states[0], p2.x_init)
+			self.assertTrue(p2.goal_reached(states[-1]) or states[-1] == p2.x_goal)
+			for x1, x2 in zip(states, states[1:]):
+				self.assertTrue(p2.valid_edge(x1, x2))
+
+		solver = RRT(self.p)
+		random.seed(9)
+		final_state, tree = solver.build_rrt(self.p.x_init, self.p.x_goal, 5000, goal_bias=0.05)
+		self.assertEqual(solver.build_rrt(self.p.x_init, self.p.x_goal, 5000, tree=tree)[0], final_state)
+		self.assertEqual(solver._iterations_executed, 0)
+
 
 class TestRRTBase(unittest.TestCase):
 
@@ -142,8 +439,580 @@ class TestRRTBase(unittest.TestCase):
 		self.assertEqual(self.rrt.nearest_neighbor(tree, (0,2)).data, (0,3))
 
 	def test_extend(self):
-		pass
+		tree = Tree((0.5,0.5))
+		node = self.rrt.extend(tree, (0.5,0.6))
+		self.assertIs(node, tree.nodes[-1])
+		self.assertEqual(node.data, (0.5,0.55))
+		self.assertIs(node.parent, tree.root)
+
+	def test_nearest_neighbors(self):
+		random.seed(0)
+		tree = Tree((0.5,0.5))
+		for i in range(200):
+			self.rrt.extend(tree, self.rrt.P.random_state())
+		xs = self.rrt.P.random_states(50)
+		self.assertEqual(self.rrt.nearest_neighbors(tree, xs), [self.rrt.nearest_neighbor(tree, x) for x in xs])
+
+	def test_extend_many(self):
+		tree = Tree((0.5,0.5))
+		nodes = self.rrt.extend_many(tree, [(0.5,0.6), (0.5,0.7), (0.52,0.5)])
+		self.assertEqual([n.data for n in nodes], [(0.5,0.55), (0.5,0.55), (0.52,0.5)])
+		self.assertEqual(len(tree.nodes), 4)
+		self.assertTrue(all(n.parent is tree.root for n in nodes)) # neighbors are found before the batch is added
+
+
+class TestBatchedStates(unittest.TestCase):
+
+	def setUp(self):
+		random.seed(1)
+		self.problems = [Basic2DProblem(x_min=0., x_max=1., y_min=0., y_max=1., init=(0.5, 0.5), goal=(1.0,1.0), goal_tolerance=0.05, max_step=0.05),
+						 BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, check_edges=True),
+						 MovingRectangleProblem(Image.open('./test_bitmap.png'), 10, 20, (80,250,0), (420,250,0), 20, max_rot=pi/18),
+						 ObstacleProblem(init=(0.1,0.1), goal=(0.9,0.9), max_step=0.05, n_obstacles=50)]
+
+	def test_new_states(self):
+		for p in self.problems:
+			x1s = p.random_states(300); x2s = p.random_states(300)
+			x1s[:50] = x2s[50:100] # short steps
+			for reverse in (False, True):
+				self.assertEqual(p.new_states(x1s, x2s, reverse), tuple(map(list, zip(*[p.new_state(x1, x2, reverse) for x1, x2 in zip(x1s, x2s)]))))
+
+	def test_metric_many(self):
+		for p in self.problems:
+			xs = p.random_states(100); x = p.random_state()
+			self.assertEqual(p.metric_many(xs, x).tolist(), [p.metric(x1, x) for x1 in xs])
+
+	def test_batched_planners(self):
+		p = self.problems[1]
+		for tree_class in (Tree, ArrayTree):
+			solver = BIRRT(p, tree_class=tree_class)
+			final_state, t_init, t_goal = solver.build_rrt(p.x_init, p.x_goal, 5000, batch_size=16)
+			self.assertIsNotNone(final_state)
+			states, inputs = solver.get_solution_from_tree(final_state, t_init, t_goal)
+			self.assertEqual((states[0], states[-1]), (p.x_init, p.x_goal))
+			self.assertTrue(all(p.valid_edge(x1, x2) for x1, x2 in zip(states, states[1:])))
+		solver = RRT(p, index=GridIndex)
+		final_state, tree = solver.build_rrt(p.x_init, p.x_goal, 10000, goal_bias=0.1, batch_size=16)
+		self.assertTrue(p.goal_reached(final_state))
+		self.assertLessEqual(solver._iterations_executed, 10000)
+
+
+class TestBIRRT(unittest.TestCase):
+
+	def test_solution(self):
+		image = Image.open('./test_bitmap.png')
+		p = BitmapProblem(image=image, init=(80,250), goal=(420,250), max_step=20, goal_tolerance=5)
+		solver = BIRRT(p)
+		final_state, t_init, t_goal = solver.build_rrt(p.x_init, p.x_goal, 5000)
+		self.assertIsNotNone(final_state)
+		states, inputs = solver.get_solution_from_tree(final_state, t_init, t_goal)
+		self.assertEqual(states[0], p.x_init)
+		self.assertEqual(states[-1], p.x_goal)
+		self.assertEqual(len(inputs), len(states)-1)
+		for x1, x2, u in zip(states, states[1:], inputs):
+			self.assertAlmostEqual(x1[0]+u[0], x2[0])
+			self.assertAlmostEqual(x1[1]+u[1], x2[1])
+
+
+class TestPlannerStats(unittest.TestCase):
+
+	def setUp(self):
+		self.p = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, check_edges=True)
+
+	def test_same_plan(self):
+		results = []
+		for profile in (False, True):
+			random.seed(2)
+			solver = BIRRT(self.p, profile=profile)
+			final_state, t1, t2 = solver.build_rrt(self.p.x_init, self.p.x_goal, 5000)
+			results.append((final_state, len(t1.nodes), len(t2.nodes)))
+		self.assertEqual(results[0], results[1])
+		self.assertNotIn('valid_state', vars(self.p)) # instrumentation is removed after the run
+
+		stats = solver.stats
+		self.assertEqual(stats.iterations, solver._iterations_executed)
+		self.assertEqual(stats.extensions, len(t1.nodes) + len(t2.nodes) - 2)
+		self.assertEqual(stats.calls['sampling'], stats.iterations)
+		self.assertEqual(stats.calls['nearest'], stats.extensions + stats.rejected)
+		self.assertGreaterEqual(stats.calls['collision'], stats.calls['steering'])
+		self.assertTrue(all(t >= 0 for t in stats.times.values()))
+		self.assertLessEqual(sum(stats.times.values()), stats.total_time)
+
+	def test_off(self):
+		solver = RRT(self.p)
+		solver.build_rrt(self.p.x_init, self.p.x_goal, 100, batch_size=8)
+		self.assertIsNone(solver.stats)
+		self.assertNotIn('build_rrt', vars(solver))
+
+	def test_batched(self):
+		solver = RRT(self.p, profile=True)
+		solver.build_rrt(self.p.x_init, self.p.x_goal, 100, batch_size=10)
+		self.assertEqual(solver.stats.extensions + solver.stats.rejected, 100)
+		self.assertEqual(solver.stats.calls['sampling'], 10)
+
+class TestRunner(unittest.TestCase):
+
+	def test_reproducible(self):
+		make_problem = lambda: Basic2DProblem(init=(0.1,0.1), goal=(0.9,0.9), max_step=0.05, goal_tolerance=0.001)
+		results = [run_trials(make_problem, BIRRT, 6, 2000, processes) for processes in (1, 3)]
+		self.assertEqual([r[:3] for r in results[0]], [r[:3] for r in results[1]])
+		self.assertTrue(all(r[0] for r in results[0]))
+		self.assertEqual(len(results[0][0][2]), 2)
+
+	def test_race(self):
+		make_problem = lambda: Basic2DProblem(init=(0.1,0.1), goal=(0.9,0.9), max_step=0.05, goal_tolerance=0.01)
+		p = make_problem()
+		portfolio = [(BIRRT, {'connect': 'both'}), (RRT, {'goal_bias': 0.05})]
+		self.assertEqual(race(make_problem, portfolio, 4, 5000, processes=1)[0], 0)
+		run, states, inputs, iterations, seconds = race(make_problem, portfolio, 4, 5000, processes=4)
+		self.assertIn(run, range(4))
+		self.assertEqual(states[0], p.x_init)
+		self.assertTrue(p.goal_reached(states[-1]))
+		self.assertEqual(len(inputs), len(states)-1)
+		self.assertIsNone(race(make_problem, portfolio[1:], 2, 10, processes=2))
+
+class TestConnect(unittest.TestCase):
+
+	def setUp(self):
+		self.p = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, goal_tolerance=5)
+
+	def check_solution(self, solver, final_state, t_init, t_goal):
+		states, inputs = solver.get_solution_from_tree(final_state, t_init, t_goal)
+		self.assertEqual((states[0], states[-1]), (self.p.x_init, self.p.x_goal))
+		self.assertEqual(len(inputs), len(states)-1)
+		for x1, x2, u in zip(states, states[1:], inputs):
+			self.assertAlmostEqual(x1[0]+u[0], x2[0])
+			self.assertAlmostEqual(x1[1]+u[1], x2[1])
+			self.assertLessEqual(sqrt(self.p.metric(x1, x2)), 20 + 1e-9)
+
+	def test_connect(self):
+		random.seed(3)
+		tree = Tree((80,250))
+		node = BIRRT(self.p).connect(tree, (150,250))
+		self.assertEqual(node.data, (150,250))
+		self.assertEqual(len(tree.nodes), 5) # steps of 20 and a last step of 10
+
+	def test_modes(self):
+		for kwargs in ({'connect': True}, {'connect': 'both'}, {'join_tolerance': 20}, {'connect': 'both', 'join_tolerance': 20, 'batch_size': 8}):
+			random.seed(4)
+			solver = BIRRT(self.p)
+			final_state, t_init, t_goal = solver.build_rrt(self.p.x_init, self.p.x_goal, 5000, **kwargs)
+			self.assertIsNotNone(final_state)
+			self.check_solution(solver, final_state, t_init, t_goal)
+
+	def test_join_tolerance(self):
+		solver = BIRRT(self.p)
+		t1 = Tree((100,100)); t2 = Tree((110,100))
+		self.assertFalse(solver.joined(t1.root, t2.root, False, 0))
+		self.assertFalse(solver.joined(t1.root, t2.root, False, 9))
+		self.assertTrue(solver.joined(t1.root, t2.root, False, 10)) # a distance, not a squared one
+		self.assertFalse(solver.joined(t1.root, Tree((130,100)).root, False, 100)) # further than max_step
+
+class TestPathSmoother(unittest.TestCase):
+
+	def check(self, p, states):
+		smoother = PathSmoother(p)
+		path, inputs = smoother.smooth(states, time_limit=1.)
+		self.assertEqual((path[0], path[-1]), (states[0], states[-1]))
+		self.assertEqual(len(inputs), len(path)-1)
+		for x1, x2, u in zip(path, path[1:], inputs):
+			self.assertTrue(p.valid_edge(x1, x2) or (x1, x2) in zip(states, states[1:]))
+			self.assertAlmostEqual(x1[0]+u[0], x2[0]); self.assertAlmostEqual(x1[1]+u[1], x2[1])
+		report = smoother.report
+		self.assertEqual(report['waypoints'], (len(states), len(path)))
+		self.assertLessEqual(report['length'][1], report['length'][0] + 1e-9)
+		return smoother
+
+	def test_bitmap(self):
+		random.seed(0)
+		p = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, check_edges=True)
+		solver = BIRRT(p)
+		states, inputs = solver.get_solution_from_tree(*solver.build_rrt(p.x_init, p.x_goal, 5000))
+		smoother = self.check(p, states)
+		self.assertLess(smoother.report['waypoints'][1], len(states)/2)
+		self.assertLess(smoother.report['length'][1], 0.9*smoother.report['length'][0])
+
+	def test_obstacles(self):
+		p = ObstacleProblem(init=(0.1,0.5), goal=(0.9,0.5), max_step=0.1, obstacles=[((0.5,0.5), 0.2)])
+		states = [(0.1,0.5), (0.2,0.8), (0.5,0.75), (0.8,0.8), (0.9,0.5)]
+		self.assertFalse(p.valid_edge((0.1,0.5), (0.9,0.5)))
+		self.assertTrue(p.valid_edge((0.2,0.8), (0.8,0.8)))
+		smoother = self.check(p, states)
+		self.assertEqual(smoother.greedy(states), [(0.1,0.5), (0.5,0.75), (0.9,0.5)])
+		self.assertLess(smoother.report['length'][1], smoother.length(smoother.greedy(states))) # random shortcuts hug the obstacle
+
+	def test_rectangle(self):
+		p = MovingRectangleProblem(Image.open('./test_bitmap.png'), 10, 20, (80,250,0), (420,250,0), 20, max_rot=pi/18)
+		self.assertTrue(p.valid_edge((80,250,0), (80,250,3.)))
+		self.assertFalse(p.valid_edge((80,250,0), (420,250,0)))
+		random.seed(1)
+		solver = BIRRT(p, index=SE2Index)
+		states, inputs = solver.get_solution_from_tree(*solver.build_rrt(p.x_init, p.x_goal, 5000, connect='both'))
+		smoother = self.check(p, states)
+		self.assertGreater(smoother.hits, 0)
+		self.assertEqual(smoother.checks, len(smoother.cache))
+
+class TestKDTreeIndex(unittest.TestCase):
+
+	def setUp(self):
+		self.p = Basic2DProblem(x_min=0., x_max=1., y_min=0., y_max=1.,
+								init=(0.5, 0.5), goal= (1.0,1.0),
+								goal_tolerance=0.05, max_step=0.05)
+
+	def test_matches_linear_scan(self):
+		index = KDTreeIndex(self.p)
+		brute = BruteForceIndex(self.p)
+		for i in range(2000):
+			x = self.p.random_state()
+			self.assertEqual(index.nearest(x), brute.nearest(x))
+			index.add(x)
+			brute.add(x)
+
+	def test_ties(self):
+		# integer states on a small grid produce many equidistant neighbors
+		index = KDTreeIndex(self.p, leaf_size=2)
+		brute = BruteForceIndex(self.p)
+		for x in [(i % 7, i // 7 % 5) for i in range(200)]:
+			index.add(x)
+			brute.add(x)
+		for x in [(3, 2), (0.5, 0.5), (6, 4), (-1, 2), (3.5, 2.5)]:
+			self.assertEqual(index.nearest(x), brute.nearest(x))
+		self.assertEqual(index.nearest_many([(3, 2), (0.5, 0.5), (3.5, 2.5)]), [brute.nearest(x) for x in [(3, 2), (0.5, 0.5), (3.5, 2.5)]])
+
+	def test_nearest_many(self):
+		index = KDTreeIndex(self.p, leaf_size=4)
+		brute = BruteForceIndex(self.p)
+		self.assertEqual(index.nearest_many([(0.5, 0.5)]), [None])
+		for i in range(1000):
+			x = self.p.random_state()
+			index.add(x)
+			brute.add(x)
+			if i % 50 == 0:
+				xs = self.p.random_states(16) + [x]
+				self.assertEqual(index.nearest_many(xs), [brute.nearest(x) for x in xs])
+		self.assertEqual(index.nearest_many([]), [])
+
+	def test_near(self):
+		index = KDTreeIndex(self.p, leaf_size=4)
+		brute = BruteForceIndex(self.p)
+		for i in range(1000):
+			x = self.p.random_state()
+			index.add(x)
+			brute.add(x)
+			if i % 50 == 0:
+				self.assertEqual(index.near(x, 0.1), brute.near(x, 0.1))
+		self.assertEqual(index.near((0.5, 0.5), 0.), [])
+
+	def test_solver_index(self):
+		rrt = RRT(self.p, index=KDTreeIndex)
+		final_state, tree = rrt.build_rrt(self.p.x_init, self.p.x_goal, 200, 0.1)
+		self.assertEqual(len(tree.index), len(tree.nodes))
 				
 
+class TestGridIndex(unittest.TestCase):
+
+	def setUp(self):
+		image = Image.open('./test_bitmap.png')
+		self.p = BitmapProblem(image=image, init=(80,250), goal=(420,250),
+								max_step=20, goal_tolerance=5)
+
+	def test_matches_linear_scan(self):
+		index = GridIndex(self.p)
+		brute = BruteForceIndex(self.p)
+		for i in range(2000):
+			x = self.p.random_state()
+			self.assertEqual(index.nearest(x), brute.nearest(x))
+			index.add(x)
+			brute.add(x)
+
+	def test_ties(self):
+		index = GridIndex(self.p, cell_size=3)
+		brute = BruteForceIndex(self.p)
+		for x in [(200 + i % 7, 200 + i // 7 % 5) for i in range(200)]:
+			index.add(x)
+			brute.add(x)
+		for x in [(203, 202), (0, 0), (206, 204), (500, 203), (210, 210)]:
+			self.assertEqual(index.nearest(x), brute.nearest(x))
+
+	def test_near(self):
+		index = GridIndex(self.p)
+		brute = BruteForceIndex(self.p)
+		for i in range(1000):
+			x = self.p.random_state()
+			index.add(x)
+			brute.add(x)
+			self.assertEqual(index.near(x, 30), brute.near(x, 30))
+		self.assertEqual(index.near((0, 0), 800), range(1000))
+
+
+class TestSE2Index(unittest.TestCase):
+
+	def setUp(self):
+		image = Image.open('./test_bitmap.png')
+		self.p = MovingRectangleProblem(image, 20, 40, (80,250,0), (420,250,0), 20, max_rot=pi/18)
+
+	def test_matches_linear_scan(self):
+		index = SE2Index(self.p, leaf_size=4)
+		brute = BruteForceIndex(self.p)
+		for i in range(2000):
+			x = self.p.random_state()
+			self.assertEqual(index.nearest(x), brute.nearest(x))
+			index.add(x)
+			brute.add(x)
+
+	def test_wraparound(self):
+		index = SE2Index(self.p, leaf_size=1)
+		for x in [(100, 100, 0.), (100, 100, 3.1), (100, 100, -1.)]:
+			index.add(x)
+		index.rebuild()
+		self.assertEqual(index.nearest((100, 100, -3.1)), 1)
+		self.assertEqual(index.nearest((100, 100, pi)), 1)
+		self.assertEqual(index.nearest((100, 100, -2.)), 2)
+
+	def test_near(self):
+		index = SE2Index(self.p, leaf_size=4)
+		brute = BruteForceIndex(self.p)
+		for i in range(1000):
+			x = self.p.random_state()
+			index.add(x)
+			brute.add(x)
+			if i % 50 == 0:
+				self.assertEqual(index.near(x, 60), brute.near(x, 60))
+				self.assertEqual(index.near((x[0], x[1], -x[2]), 60), brute.near((x[0], x[1], -x[2]), 60))
+
+
+class TestBudget(unittest.TestCase):
+
+	def setUp(self):
+		self.p = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, goal_tolerance=5)
+		self.open = Basic2DProblem(init=(0.5, 0.5), goal=(0.9, 0.9), goal_tolerance=0., max_step=0.001) # goal never reached, trees never joined
+
+	def test_iter_matches_build(self):
+		for solver, kwargs in ((RRT(self.p), {'goal_bias': 0.05}), (BIRRT(self.p), {}), (BIRRT(self.p), {'batch_size': 8})):
+			random.seed(7)
+			result = solver.build_rrt(self.p.x_init, self.p.x_goal, 5000, **kwargs)
+			random.seed(7)
+			snapshots = list(solver.iter_rrt(self.p.x_init, self.p.x_goal, 5000, every=50, **kwargs))
+			last = snapshots.pop()
+			self.assertTrue(last.done)
+			self.assertEqual(last.result[0], result[0])
+			self.assertEqual(last.tree_sizes, [len(tree.nodes) for tree in result[1:]])
+			self.assertEqual(last.iteration, solver._iterations_executed)
+			self.assertFalse(any(s.done for s in snapshots))
+			for k, s in enumerate(snapshots):
+				self.assertTrue(50*(k+1) <= s.iteration < 50*(k+1) + kwargs.get('batch_size', 1)) # batches are not split
+		with self.assertRaisesRegexp(TypeError, 'live_vis'):
+			RRT(self.p).iter_rrt(self.p.x_init, self.p.x_goal, 100, live_vis=10)
+
+	def test_time_limit(self):
+		solver = RRT(self.open)
+		final_state, tree = solver.build_rrt(self.open.x_init, self.open.x_goal, 10**7, time_limit=0.1)
+		self.assertIsNone(final_state)
+		self.assertEqual(solver.stopped, 'time_limit')
+		self.assertLess(solver._iterations_executed, 10**7)
+		solver.build_rrt(self.open.x_init, self.open.x_goal, 100)
+		self.assertIsNone(solver.stopped)
+
+	def test_should_stop(self):
+		calls = []
+		def should_stop():
+			calls.append(1)
+			return len(calls) > 5
+		for solver in (RRT(self.open), BIRRT(self.open), RRTStar(self.open)):
+			del calls[:]
+			result = solver.build_rrt(self.open.x_init, self.open.x_goal, 10**6, should_stop=should_stop)
+			self.assertIsNone(result[0])
+			self.assertEqual(solver.stopped, 'cancelled')
+			self.assertEqual(solver._iterations_executed, 6*solver.check_every) # checked after every check_every iterations
+
+	def test_rrt_star_progress(self):
+		random.seed(6)
+		solver = RRTStar(self.p)
+		snapshots = list(solver.iter_rrt(self.p.x_init, self.p.x_goal, 3000, goal_bias=0.05, every=100))
+		self.assertEqual(len(snapshots), 30)
+		costs = [s.cost for s in snapshots if s.best is not None]
+		self.assertTrue(costs)
+		self.assertEqual(costs, sorted(costs, reverse=True))
+		self.assertEqual(snapshots[-1].result[0], snapshots[-1].best)
+		self.assertAlmostEqual(snapshots[-1].cost, solver.cost())
+
+
+class TestPRM(unittest.TestCase):
+
+	def setUp(self):
+		self.p = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, goal_tolerance=5, check_edges=True)
+		self.cache_dir = tempfile.mkdtemp()
+		random.seed(10)
+		self.prm = PRM(self.p, 1500, cache_dir=self.cache_dir)
+
+	def tearDown(self):
+		shutil.rmtree(self.cache_dir)
+
+	def path_cost(self, states):
+		return sum(sqrt(self.p.metric(x1, x2)) for x1, x2 in zip(states, states[1:]))
+
+	def test_query(self):
+		states, inputs = self.prm.query(self.p.x_init, self.p.x_goal)
+		self.assertEqual((states[0], states[-1]), (self.p.x_init, self.p.x_goal))
+		self.assertEqual(len(inputs), len(states)-1)
+		for x1, x2, u in zip(states, states[1:], inputs):
+			self.assertTrue(self.p.valid_edge(x1, x2))
+			self.assertLessEqual(sqrt(self.p.metric(x1, x2)), 20 + 1e-9)
+			self.assertAlmostEqual(x1[0]+u[0], x2[0])
+			self.assertAlmostEqual(x1[1]+u[1], x2[1])
+		self.assertEqual(self.prm.query((100,100), (110,100)), ([(100,100), (110,100)], [(10,0)]))
+
+	def test_heuristic(self):
+		# A* with the landmark heuristic finds paths as short as Dijkstra's algorithm (A* without heuristic)
+		for a, b in [(self.p.x_init, self.p.x_goal), ((420,250), (80,250)), ((60,60), (440,440)), ((250,100), (250,400))]:
+			to_goal = self.p.metric_many(self.prm.states, b)
+			sources = self.prm.connections(a, self.p.metric_many(self.prm.states, a))
+			targets = self.prm.connections(b, to_goal, to_x=True)
+			h = self.prm.heuristic(np.sqrt(to_goal), targets)
+			costs = []
+			for heuristic in (h, [0.]*len(h)):
+				path = self.prm.astar(sources, targets, heuristic)
+				costs.append(sources[path[0]] + self.path_cost([self.prm.state(i) for i in path]) + targets[path[-1]])
+			self.assertAlmostEqual(costs[0], costs[1])
+			self.assertGreaterEqual(costs[0] + 1e-9, min(h[i] + sources[i] for i in sources)) # admissible
+
+	def test_cache(self):
+		self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+		prm = PRM(self.p, 1500, cache_dir=self.cache_dir)
+		self.assertTrue((prm.states == self.prm.states).all())
+		PRM(self.p, 1000, cache_dir=self.cache_dir)
+		PRM(BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 10, check_edges=True), 1500, cache_dir=self.cache_dir)
+		self.assertEqual(len(os.listdir(self.cache_dir)), 3)
+
+		# the start, the goal tolerance and arrays derived from the map do not change the roadmap
+		same = BitmapProblem(Image.open('./test_bitmap.png'), (60,60), (420,250), 20, goal_tolerance=30, check_edges=True, clearance=True)
+		self.assertEqual(problem_key(same).hexdigest(), problem_key(self.p).hexdigest())
+		PRM(same, 1500, cache_dir=self.cache_dir)
+		self.assertEqual(len(os.listdir(self.cache_dir)), 3)
+
+		# neither does the collision grid of ObstacleProblem, derived from its obstacles
+		obstacles = ObstacleProblem(n_obstacles=20)
+		key = problem_key(obstacles).hexdigest()
+		obstacles.cell *= 2; obstacles.nx = obstacles.ny = 1; obstacles.buckets = [sum(obstacles.buckets, [])]
+		self.assertEqual(problem_key(obstacles).hexdigest(), key)
+
+	def test_unreachable(self):
+		prm = PRM(Basic2DProblem(max_step=0.01), 20, cache_dir=None)
+		self.assertEqual(prm.query((0.,0.), (1.,1.)), (None, None))
+		labels = prm.components.tolist()
+		j = next(j for j in range(len(labels)) if labels[j] != labels[0])
+		self.assertIsNone(prm.astar({0: 0.}, {j: 0.}, [0.]*len(labels)))
+
+
+class TestVisualize(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_save(self):
+		p = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, goal_tolerance=5)
+		q = MovingRectangleProblem(Image.open('./test_bitmap.png'), 20, 40, (80,250,0), (420,250,0), 20, max_rot=pi/18)
+		for problem, name in ((p, 'bitmap.png'), (q, 'rectangle.svg')):
+			random.seed(11)
+			path = os.path.join(self.dir, name)
+			solver = BIRRT(problem)
+			final_state, t_init, t_goal = solver.build_rrt(problem.x_init, problem.x_goal, 5000, show_vis=path)
+			self.assertIsNotNone(final_state)
+			self.assertGreater(os.path.getsize(path), 0)
+
+	def test_draw_tree(self):
+		tree = ArrayTree((0.,0.))
+		tree.add_node((1.,1.), tree.root, (1.,1.))
+		tree.add_node((2.,0.), tree.nodes[1], (1.,-1.))
+		v = Basic2DProblem().setup_vis()
+		v.draw_tree(*tree.arrays()[:2])
+		segments = v.figure.gca().collections[-1].get_segments()
+		self.assertEqual([s.tolist() for s in segments], [[[0,0],[1,1]], [[1,1],[2,0]]])
+		v.save(os.path.join(self.dir, 'tree.png'))
+
+	def test_segments(self):
+		for tree_class in (Tree, ArrayTree):
+			tree = tree_class((0.,0.))
+			tree.add_node((1.,1.), tree.root, (1.,1.))
+			tree.add_node((2.,0.), tree.nodes[1], (1.,-1.))
+			self.assertEqual(tree.segments().tolist(), [[[0,0],[1,1]], [[1,1],[2,0]]])
+			self.assertEqual(tree.segments(2).tolist(), [[[1,1],[2,0]]])
+			self.assertEqual(tree.segments(3).shape, (0, 2, 2))
+
+	def test_live_view(self):
+		p = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, goal_tolerance=5)
+		path = os.path.join(self.dir, 'live.png')
+		results = []
+		for live_vis in (None, 50):
+			random.seed(11)
+			solver = BIRRT(p)
+			results.append(solver.build_rrt(p.x_init, p.x_goal, 5000, live_vis=live_vis, show_vis=path))
+			self.assertIsNone(solver._live_view)
+		self.assertIsNotNone(results[1][0])
+		self.assertEqual(results[0][0], results[1][0]) # drawing does not change the search
+		self.assertGreater(os.path.getsize(path), 0)
+
+		random.seed(11)
+		view = LiveView(p.setup_vis(), ('r', 'b'))
+		for progress in BIRRT(p).iter_rrt(p.x_init, p.x_goal, 5000, every=50):
+			view.update([tree.segments(n + 1) for tree, n in zip(progress.trees, view.counts)])
+		self.assertEqual(view.counts, [len(tree.nodes) - 1 for tree in progress.trees])
+		view.close()
+
+
+class TestRRTStar(unittest.TestCase):
+
+	def setUp(self):
+		self.p = BitmapProblem(Image.open('./test_bitmap.png'), (80,250), (420,250), 20, goal_tolerance=5)
+
+	def path_cost(self, states):
+		return sum(sqrt(self.p.metric(x1, x2)) for x1, x2 in zip(states, states[1:]))
+
+	def test_costs(self):
+		for tree_class in (Tree, ArrayTree):
+			random.seed(5)
+			solver = RRTStar(self.p, index=GridIndex, tree_class=tree_class)
+			final_state, tree = solver.build_rrt(self.p.x_init, self.p.x_goal, 3000, goal_bias=0.05)
+			self.assertTrue(self.p.goal_reached(final_state))
+			for i, node in enumerate(tree.nodes):
+				self.assertAlmostEqual(solver.costs[i], self.path_cost(tree.get_path(node)[0]))
+			states, inputs = solver.get_solution_from_tree(final_state, tree)
+			self.assertAlmostEqual(solver.cost(), self.path_cost(states))
+			for x1, x2, u in zip(states, states[1:], inputs):
+				self.assertAlmostEqual(x1[0]+u[0], x2[0])
+				self.assertAlmostEqual(x1[1]+u[1], x2[1])
+
+	def test_anytime(self):
+		random.seed(6)
+		solver = RRTStar(self.p)
+		final_state, tree = solver.build_rrt(self.p.x_init, self.p.x_goal, 3000, goal_bias=0.05, first_solution=True)
+		first_cost = solver.cost()
+		self.assertEqual(len(solver.solutions), 1)
+
+		random.seed(6)
+		final_state, tree = solver.build_rrt(self.p.x_init, self.p.x_goal, 10**6, goal_bias=0.05, time_limit=1.)
+		self.assertLess(solver.solutions[-1][0], 1.)
+		self.assertAlmostEqual(solver.solutions[0][2], first_cost)
+		self.assertLess(solver.cost(), first_cost)
+		costs = [cost for t, iterations, cost in solver.solutions]
+		self.assertEqual(costs, sorted(costs, reverse=True))
+		self.assertGreaterEqual(solver.cost(), self.path_cost([self.p.x_init, final_state]) - 1e-9) # never shorter than the straight line
+
+	def test_rectangle_index(self):
+		p = MovingRectangleProblem(Image.open('./test_bitmap.png'), 20, 40, (80,250,0), (420,250,0), 20, max_rot=pi/18)
+		self.assertIs(RRTStar(self.p).index, KDTreeIndex)
+		random.seed(7)
+		solver = RRTStar(p)
+		self.assertIs(solver.index, SE2Index)
+		final_state, tree = solver.build_rrt(p.x_init, p.x_goal, 500)
+		for x in p.random_states(20) + [(x[0], x[1], -x[2]) for x in p.random_states(20)]:
+			distances = p.metric_many(tree.state_array(), x)
+			self.assertEqual(solver.near_neighbors(tree, x, 60), np.flatnonzero(distances <= 60*60).tolist())
+			self.assertEqual(solver.nearest_position(tree, x), int(distances.argmin()))
+
+
 if __name__ == '__main__':
 	unittest.main()
\ No newline at end of file
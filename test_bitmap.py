@@ -2,6 +2,7 @@
 
 import rrt
 from problem import BitmapProblem
+from smoothing import PathSmoother
 
 from PIL import Image
 
@@ -20,4 +21,14 @@ if __name__ == '__main__':
 	solver = rrt.BIRRT(problem)
 	final_state,tree1,tree2 = solver.build_rrt(problem.x_init, problem.x_goal, 10000, show_vis=True)
 
-	print solver.get_solution_from_tree(final_state,tree1,tree2)
\ No newline at end of file
+	if final_state is None:
+		print "No solution found"
+	else:
+		states, inputs = solver.get_solution_from_tree(final_state,tree1,tree2)
+		print states, inputs
+
+		# Shorten the path
+		smoother = PathSmoother(problem)
+		states, inputs = smoother.smooth(states, time_limit=0.2)
+		print "smoothed: waypoints %d -> %d, length %.1f -> %.1f" % (smoother.report['waypoints'] + smoother.report['length'])
+		print states, inputs
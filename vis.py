@@ -1,8 +1,19 @@
+''' Module vis draws trees and solutions with matplotlib. Trees are drawn as a single LineCollection, and rectangles as a single PatchCollection, so that drawing takes little time even for large trees.
+
+	On Linux without a display (no DISPLAY variable) and without a backend set in MPLBACKEND, the Agg backend is selected, and figures can only be saved to files, with save.
+'''
+
+import os, sys
+import matplotlib as mpl
+if sys.platform.startswith('linux') and not os.environ.get('DISPLAY') and not os.environ.get('MPLBACKEND'):
+	mpl.use('Agg')
+
 import matplotlib.pyplot as plot
 from PIL import Image
 
-from matplotlib.patches import Rectangle
-import matplotlib as mpl
+from matplotlib.patches import Rectangle, Polygon
+from matplotlib.collections import LineCollection, PatchCollection
+import numpy as np
 import math
 
 def main():
@@ -29,11 +40,8 @@ class Visualizer:
 		## Draw Obstacles ##
 		if isinstance(obstacles, (list, tuple)):
 			self.obstacles = obstacles
-			for obstacle in self.obstacles:
-				self.figure.gca().add_artist(plot.Circle(obstacle[0],
-													obstacle[1],
-													color='r',
-													alpha=0.3))
+			self.figure.gca().add_collection(PatchCollection([plot.Circle(center, radius) for center, radius in obstacles],
+															 color='r', alpha=0.3))
 		elif isinstance(obstacles, Image.Image):
 			plot.imshow(obstacles)
 
@@ -47,13 +55,21 @@ class Visualizer:
 		# plot.arrow(x1[0], x1[1], x2[0]-x1[0], x2[1]-x1[1], length_includes_head=True, head_width=0.008*(self.xmax-self.xmin), color=color)
 		plot.plot((x1[0],x2[0]), (x1[1],x2[1]), '.-'+color)
 
+	def draw_tree(self, states, parents, color='k'):
+		''' Draws the edges of a tree, given the (n, d) array of its states and the positions of their parents (-1 for the root), as draw_edge would. '''
+		draw_tree(self.figure.gca(), states, parents, color)
+
 	def draw_solution(self, path, color='r'):
-		for i in xrange(0, len(path)-1):
-			plot.plot((path[i][0],path[i+1][0]), (path[i][1],path[i+1][1]), 'o-'+color, linewidth=3.0)
+		path = np.asarray(path, dtype=float)
+		plot.plot(path[:,0], path[:,1], 'o-'+color, linewidth=3.0)
 
 	def done(self, block=True):
 		plot.show(block=block)
 
+	def save(self, path):
+		''' Writes the figure to file path, in the format given by its extension (e.g. .png or .svg), and closes it. '''
+		save(self.figure, path)
+
 class RectangeVisualizer:
 	def __init__(self, xmin, xmax, ymin, ymax, rwidth, rheight, obstacles):
 		## State Space Bounds ##
@@ -78,11 +94,8 @@ class RectangeVisualizer:
 		## Draw Obstacles ##
 		if isinstance(obstacles, (list, tuple)):
 			self.obstacles = obstacles
-			for obstacle in self.obstacles:
-				self.figure.gca().add_artist(plot.Circle(obstacle[0],
-													obstacle[1],
-													color='r',
-													alpha=0.3))
+			self.figure.gca().add_collection(PatchCollection([plot.Circle(center, radius) for center, radius in obstacles],
+															 color='r', alpha=0.3))
 		elif isinstance(obstacles, Image.Image):
 			plot.imshow(obstacles)
 
@@ -105,14 +118,91 @@ class RectangeVisualizer:
 		# plot.arrow(x1[0], x1[1], x2[0]-x1[0], x2[1]-x1[1], length_includes_head=True, head_width=0.008*(self.xmax-self.xmin), color=color)
 		plot.plot((x1[0],x2[0]), (x1[1],x2[1]), '.-'+color)
 
+	def draw_rectangles(self, states, color='k'):
+		''' Draws the rectangle at each of the (x, y, r) states, as one PatchCollection. '''
+		states = np.asarray(states, dtype=float).reshape(-1, 3)
+		corners = np.array([(-1,-1), (1,-1), (1,1), (-1,1)])*(self.rwidth/2.0, self.rheight/2.0)
+		cos = np.cos(states[:,2])[:,None]; sin = np.sin(states[:,2])[:,None]
+		xs = states[:,0:1] + cos*corners[:,0] - sin*corners[:,1]
+		ys = states[:,1:2] + sin*corners[:,0] + cos*corners[:,1]
+		self.ax.add_collection(PatchCollection([Polygon(c) for c in np.dstack((xs, ys))], facecolor='none', edgecolor=color))
+
+	def draw_tree(self, states, parents, color='k'):
+		''' Draws the edges of a tree between the centres of the rectangles, given the (n, 3) array of its states and the positions of their parents (-1 for the root), as draw_edge would. '''
+		draw_tree(self.ax, states, parents, color)
+
 	def draw_solution(self, path, color='r'):
-		for i in xrange(0, len(path)-1):
-			x1 = path[i]; x2 = path[i+1]
-			self.draw_rectange(x1[0:2], x1[2], self.rwidth, self.rheight)
-			plot.plot((x1[0],x2[0]), (x1[1],x2[1]), 'o-'+color, linewidth=3.0)
+		self.draw_rectangles(path[:-1])
+		path = np.asarray(path, dtype=float)
+		plot.plot(path[:,0], path[:,1], 'o-'+color, linewidth=3.0)
 
 	def done(self, block=True):
 		plot.show(block=block)
 
+	def save(self, path):
+		''' Writes the figure to file path, in the format given by its extension (e.g. .png or .svg), and closes it. '''
+		save(self.figure, path)
+
+class LiveView:
+	''' Draws trees as they grow, with blitting: each update draws only the edges added since the last one over a copy of the previous frame, and copies the result to the screen, so that the cost of a frame does not grow with the trees.
+
+		The edges of each tree are drawn as one line broken by NaN gaps, which matplotlib renders as a single path, much faster than a LineCollection with one path per edge. The figure is only redrawn in full when the window is resized or exposed, which draws all the edges received so far.
+	'''
+	def __init__(self, visualizer, colors=('k',)):
+		''' Takes a Visualizer or RectangeVisualizer, whose figure is used, and the color of each tree. '''
+		self.figure = visualizer.figure
+		self.ax = self.figure.gca()
+		self.canvas = self.figure.canvas
+		self.counts = [0]*len(colors) # number of edges drawn, for each tree
+		self.lines = [[] for color in colors] # (3n, 2) arrays of the edges drawn, as passed to Line2D, for each tree
+		self.artists = [self.ax.plot([], [], '-'+color, animated=True, scalex=False, scaley=False)[0] for color in colors]
+		self.connection = self.canvas.mpl_connect('draw_event', self.on_draw)
+		if mpl.get_backend().lower() != 'agg':
+			plot.show(block=False)
+		self.canvas.draw()
+
+	def on_draw(self, event):
+		''' Draws every edge received so far over a full redraw of the figure, and keeps the result as the background of the next frame. '''
+		for artist, lines in zip(self.artists, self.lines):
+			if lines:
+				artist.set_data(np.concatenate(lines).T)
+				self.ax.draw_artist(artist)
+		self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+
+	def update(self, segments):
+		''' Draws new edges of each tree, given as an (n, 2, d) array of (parent state, state) pairs per tree. Only the first two coordinates of the states are drawn. '''
+		self.canvas.restore_region(self.background)
+		for k, new in enumerate(segments):
+			if not len(new):
+				continue
+			new = np.asarray(new, dtype=float)
+			line = np.full((len(new), 3, 2), np.nan)
+			line[:,:2] = new[:,:,:2]
+			line = line.reshape(-1, 2)
+			self.lines[k].append(line)
+			self.counts[k] += len(new)
+			self.artists[k].set_data(line.T)
+			self.ax.draw_artist(self.artists[k])
+		self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+		self.canvas.blit(self.ax.bbox)
+		self.canvas.flush_events()
+
+	def close(self):
+		self.canvas.mpl_disconnect(self.connection)
+		plot.close(self.figure)
+
+def draw_tree(ax, states, parents, color='k'):
+	''' Adds the edges of a tree to axes ax as one LineCollection, with the nodes as dots. Only the first two coordinates of the states are drawn. '''
+	states = np.asarray(states, dtype=float)[:,:2]
+	parents = np.asarray(parents)
+	children = np.flatnonzero(parents >= 0)
+	if len(children):
+		ax.add_collection(LineCollection(np.stack((states[parents[children]], states[children]), axis=1), colors=color))
+		ax.plot(states[:,0], states[:,1], '.'+color, linestyle='none')
+
+def save(figure, path):
+	figure.savefig(path)
+	plot.close(figure)
+
 if __name__ == "__main__":
 	main()